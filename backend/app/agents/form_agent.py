@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
-import os
 import logging
 import re
 import json
@@ -9,14 +8,25 @@ from pathlib import Path
 
 from langgraph.graph import StateGraph, MessagesState
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
 
 from app.config.settings import settings
+from app.agents.llm_router import build_llm_router, TASK_EXTRACT, TASK_INFER_SCHEMA, TASK_CONFIRM_INTENT
+from app.agents.llm_usage import UsageTags
+from app.agents.prompts import PromptLibrary
+from app.agents.static_replies import StaticReplies, load_forms_manifest
+from app.observability.logs import trace_enabled
 
 logger = logging.getLogger(__name__)
 
 
+def _trace(msg: str, *args: Any) -> None:
+    """Per-turn debug record, kept only for runs sampled by ``bind_log_context``."""
+    if trace_enabled(logger):
+        logger.debug(msg, *args, stacklevel=2)
+
+
 FIELDS = [
     ("name", "Please provide your full name."),
     ("email", "What is your email address?"),
@@ -26,21 +36,18 @@ FIELDS = [
     ("location", "Where is the issue located? (office/site/remote)"),
 ]
 
+# Replies at schema confirmation that ask for an edit; the intent model never confirms these
+SCHEMA_EDIT_INTENT = re.compile(
+    r"\b(add|remove|drop|delete|change|rename|replace|edit|instead|without|except|but|field|fields|theme)\b",
+    re.IGNORECASE,
+)
+# Longer replies are treated as change requests rather than a plain confirmation
+CONFIRM_REPLY_MAX_WORDS = 6
+
 
 def build_form_agent_graph():
-    # Configure OpenRouter-backed LLM via OpenAI-compatible client if key provided
-    llm = None
-    if settings.openrouter_api_key:
-        os.environ.setdefault("OPENAI_API_KEY", settings.openrouter_api_key)
-        os.environ.setdefault("OPENAI_BASE_URL", settings.openrouter_base_url)
-        try:
-            llm = ChatOpenAI(
-                model=settings.openrouter_model,
-                temperature=0.2,
-            )
-        except Exception:
-            logger.exception("LLM init failed; continuing without LLM acks")
-            llm = None
+    # Configure OpenRouter-backed LLMs (one model chain per task) if key provided
+    llm = build_llm_router()
 
     # Load field-aware knowledge
     knowledge: Dict[str, Any] = {}
@@ -53,14 +60,11 @@ def build_form_agent_graph():
         logger.exception("Failed to load service auth knowledge; proceeding without it")
 
     # Load forms manifest for dynamic schemas
-    forms_manifest: Dict[str, Any] = {}
-    try:
-        fm_path = Path(__file__).parent / "forms_manifest.json"
-        with open(fm_path, "r", encoding="utf-8") as f:
-            forms_manifest = json.load(f)
-        logger.info("Loaded forms manifest: %s", list(forms_manifest.keys()))
-    except Exception:
-        logger.exception("Failed to load forms manifest; proceeding without it")
+    forms_manifest: Dict[str, Any] = load_forms_manifest()
+    static_replies = StaticReplies(forms_manifest)
+
+    # Extract prompts for every manifest field, compiled once
+    prompts = PromptLibrary(forms_manifest, knowledge, settings.llm_extract_prompt_max_tokens)
 
     class FormState(MessagesState):
         form: Dict[str, Any]
@@ -111,38 +115,15 @@ def build_form_agent_graph():
 
     async def ask_or_finish(state: Dict[str, Any]):
         state = ensure_state_defaults(state)
-        logger.debug("ask_or_finish: next_field_index=%s asked_index=%s awaiting=%s", state.get("next_field_index"), state.get("asked_index"), state.get("awaiting_confirmation"))
+        _trace("ask_or_finish: next_field_index=%s asked_index=%s awaiting=%s", state.get("next_field_index"), state.get("asked_index"), state.get("awaiting_confirmation"))
 
         # Friendly greeting once
         if (not state.get("greeted")):
-            services_list = []
-            try:
-                for key, val in forms_manifest.items():
-                    title = (val.get("title") or key.replace("_", " ").title())
-                    # Show as Request per requirement
-                    title_req = title.replace("Form", "Request")
-                    services_list.append(f"- {title_req} ({key})")
-            except Exception:
-                services_list = []
-            services_text = "\n".join(services_list) if services_list else (
-                "- Service Authorization Request (service_auth)\n"
-                "- Exit Request Request (exit_request)\n"
-                "- Reimbursement Request (reimbursement)\n"
-                "- Bonafide Certificate Request (bonafide_certificate)"
-            )
-            greet = (
-                "Hi, I'm HelpDesk Assistant. I can help you create and submit IT helpdesk related requests.\n\n"
-                "Here are some requests I can create right away:\n"
-                f"{services_text}\n\n"
-                "Tell me which one you want (e.g., 'reimbursement request') or describe a new form (e.g., 'create a policy request UI'), and I'll build it for you."
-            )
-            return {"messages": [AIMessage(content=greet)], "greeted": True}
+            return {"messages": [AIMessage(content=static_replies.greeting)], "greeted": True}
 
         # If schema not chosen yet, ask which form type user needs
         if not state.get("schema") and not state.get("schema_build_mode"):
-            choices = ", ".join(sorted(forms_manifest.keys())) if forms_manifest else "service_auth"
-            msg = f"Which form would you like to fill? (choices: {choices})"
-            return {"messages": [AIMessage(content=msg)]}
+            return {"messages": [AIMessage(content=static_replies.choose_form)]}
 
         # If building a custom schema, ask user to provide fields specification
         if state.get("schema_build_mode") and not state.get("schema"):
@@ -184,7 +165,7 @@ def build_form_agent_graph():
                 fields_list = [(f.get("key"), f.get("prompt") or f.get("label") or f.get("key")) for f in schema_fields]
         if state["next_field_index"] >= len(fields_list):
             # All fields collected; summarize and end
-            logger.debug("ask_or_finish: finished")
+            _trace("ask_or_finish: finished")
             return {
                 "messages": [
                     AIMessage(content="Thank you. All required details have been collected.")
@@ -192,10 +173,10 @@ def build_form_agent_graph():
             }
         cur_idx = state["next_field_index"]
         if state.get("asked_index") == cur_idx:
-            logger.debug("ask_or_finish: already asked for index %s, skipping emit", cur_idx)
+            _trace("ask_or_finish: already asked for index %s, skipping emit", cur_idx)
             return {}
         field_key, prompt = fields_list[cur_idx]
-        logger.debug("ask_or_finish: asking '%s' (idx=%s)", field_key, cur_idx)
+        _trace("ask_or_finish: asking '%s' (idx=%s)", field_key, cur_idx)
         return {
             "messages": [AIMessage(content=prompt)],
             "asked_index": cur_idx
@@ -203,14 +184,19 @@ def build_form_agent_graph():
 
     async def cleanup_messages(state: Dict[str, Any]):
         # Ensure messages are not persisted in the checkpoint to avoid regenerate mode
-        logger.debug("cleanup_messages: purge before checkpoint")
+        _trace("cleanup_messages: purge before checkpoint")
         return {"messages": []}
 
-    async def process_user(state: Dict[str, Any]):
+    async def process_user(state: Dict[str, Any], config: RunnableConfig):
         state = ensure_state_defaults(state)
         idx = state["next_field_index"]
         if idx >= len(FIELDS):
             return state
+        thread_id = (config.get("configurable") or {}).get("thread_id")
+
+        # Usage accounting: which thread, form and field an LLM call was made for
+        def usage_tags(field_key: Optional[str] = None, form_type: Optional[str] = None) -> UsageTags:
+            return UsageTags(thread_id=thread_id, form_type=form_type or state.get("form_type"), field=field_key)
 
         # Helper: normalization (same as below)
         def normalize_field_value(key: str, value: str) -> str:
@@ -280,32 +266,40 @@ def build_form_agent_graph():
             return text
 
         # Optional: LLM-assisted extraction for smarter suggestions
-        def llm_extract_field_suggestion(field: str, raw_text: str) -> Optional[str]:
+        async def llm_extract_field_suggestion(field: Dict[str, Any], raw_text: str) -> Optional[str]:
             if llm is None:
                 return None
             try:
-                field_info = knowledge.get("fields", {}).get(field, {})
-                f_format = field_info.get("format", "")
-                f_examples = "\n".join(["- " + ex for ex in field_info.get("examples", [])])
-                prompt = (
-                    f"You are a field-aware intake assistant for {knowledge.get('domain','Service Desk')}.\n"
-                    f"Field: {field.replace('_',' ')}\n"
-                    f"Expected format: {f_format}\n"
-                    f"Examples:\n{f_examples}\n\n"
-                    "Task: Extract the user's answer for this field from the message.\n"
-                    "- Return only the value, no extra words.\n"
-                    "- For email, return a valid email like user@domain.tld.\n"
-                    "- For location, return exactly one of: office, site, remote.\n"
-                    f"Message: {raw_text}"
+                prompt = prompts.get(state.get("form_type"), field).messages(raw_text)
+                # Raced against the per-turn budget; None means the heuristic answer stands
+                val = await llm.ainvoke(
+                    TASK_EXTRACT,
+                    prompt,
+                    budget_s=settings.llm_turn_budget_s,
+                    hedge=settings.llm_hedge_enabled,
+                    tags=usage_tags(field.get("key")),
                 )
-                resp = llm.invoke(prompt)  # type: ignore
-                val = getattr(resp, "content", None)
                 if isinstance(val, str):
                     return val.strip()
             except Exception:
-                logger.exception("LLM extract failed for field=%s", field)
+                logger.exception("LLM extract failed for field=%s", field.get("key"))
             return None
 
+        async def llm_classify_confirmation(text: str) -> Optional[str]:
+            if llm is None:
+                return None
+            prompt = (
+                "Classify the user's reply to 'Do these form fields look right?'.\n"
+                "Answer with exactly one word: yes, no, or other.\n"
+                f"Reply: {text}"
+            )
+            tags = usage_tags(form_type=state.get("proposed_form_type"))
+            val = await llm.ainvoke(TASK_CONFIRM_INTENT, prompt, budget_s=settings.llm_turn_budget_s, tags=tags)
+            if not isinstance(val, str):
+                return None
+            word = val.strip().lower().strip(".!'\"` ")
+            return word if word in ("yes", "no", "other") else None
+
         # If awaiting confirmation, interpret yes/no/correction
         if state.get("awaiting_confirmation") and state.get("pending_field_index") is not None:
             user_txt = state.get("pending_user_text")
@@ -327,19 +321,19 @@ def build_form_agent_graph():
                 state["awaiting_confirmation"] = False
                 state["pending_field_index"] = None
                 state["pending_value"] = None
-                logger.debug("confirm: committed %s='%s' -> next %s", field_key, commit_val, state["next_field_index"])
+                _trace("confirm: committed %s='%s' -> next %s", field_key, commit_val, state["next_field_index"])
                 return state
             if no:
                 # Reject; clear and re-ask same field
                 state["awaiting_confirmation"] = False
                 state["pending_field_index"] = None
                 state["pending_value"] = None
-                logger.debug("confirm: rejected suggestion for %s; will re-ask", field_key)
+                _trace("confirm: rejected suggestion for %s; will re-ask", field_key)
                 return state
             # Treat as correction
             corrected = normalize_field_value(field_key, txt)
             state["pending_value"] = corrected
-            logger.debug("confirm: updated pending %s to '%s' (awaiting)", field_key, corrected)
+            _trace("confirm: updated pending %s to '%s' (awaiting)", field_key, corrected)
             return state
 
         # Handle form type selection if schema not set
@@ -365,7 +359,7 @@ def build_form_agent_graph():
             state["schema"] = forms_manifest[selected_key]
             state["form_type"] = selected_key
             state["next_field_index"] = 0
-            logger.debug("Selected schema '%s' with %s fields", selected_key, len(state["schema"].get("fields", [])))
+            _trace("Selected schema '%s' with %s fields", selected_key, len(state["schema"].get("fields", [])))
             return state
 
         # Parse custom schema fields provided by user
@@ -377,7 +371,7 @@ def build_form_agent_graph():
             submit_label: Optional[str] = None
             try:
                 # LLM inference first from natural language description
-                def llm_infer_schema(description: str) -> Optional[Dict[str, Any]]:
+                async def llm_infer_schema(description: str) -> Optional[Dict[str, Any]]:
                     if llm is None:
                         return None
                     try:
@@ -390,8 +384,9 @@ def build_form_agent_graph():
                             "Do not include explanations."
                         )
                         user = f"Form description: {description}"
-                        resp = llm.invoke([SystemMessage(content=sys), HumanMessage(content=user)])  # type: ignore
-                        content = getattr(resp, "content", "")
+                        messages = [SystemMessage(content=sys), HumanMessage(content=user)]
+                        tags = usage_tags(form_type=state.get("proposed_form_type") or "custom")
+                        content = await llm.ainvoke(TASK_INFER_SCHEMA, messages, tags=tags) or ""
                         start = content.find("{"); end = content.rfind("}")
                         if start != -1 and end != -1 and end > start:
                             return json.loads(content[start:end+1])
@@ -399,13 +394,13 @@ def build_form_agent_graph():
                         logger.exception("LLM schema inference failed")
                     return None
 
-                inferred = llm_infer_schema(spec_text)
+                inferred = await llm_infer_schema(spec_text)
                 if inferred is not None and isinstance(inferred, dict) and isinstance(inferred.get("fields", []), list):
                     state["schema"] = inferred
                     state["form_type"] = (state.get("proposed_form_type") or inferred.get("title") or "custom").replace(" ", "_")
                     state["schema_build_mode"] = False
                     state["next_field_index"] = 0
-                    logger.debug("Built custom schema via LLM with %s fields", len(inferred.get("fields", [])))
+                    _trace("Built custom schema via LLM with %s fields", len(inferred.get("fields", [])))
                     return state
 
                 # Heuristic natural-language parser
@@ -544,7 +539,7 @@ def build_form_agent_graph():
                     state["form_type"] = (state.get("proposed_form_type") or "custom").replace(" ", "_")
                     state["schema_build_mode"] = False
                     state["next_field_index"] = 0
-                    logger.debug("Built custom schema via heuristics with %s fields", len(nat_fields))
+                    _trace("Built custom schema via heuristics with %s fields", len(nat_fields))
                     return state
 
                 # Fallback: split by commas not inside parentheses and parse key:type:required(options)
@@ -584,7 +579,7 @@ def build_form_agent_graph():
                 state["form_type"] = (state.get("proposed_form_type") or "custom").replace(" ", "_")
                 state["schema_build_mode"] = False
                 state["next_field_index"] = 0
-                logger.debug("Built custom schema with %s fields", len(fields))
+                _trace("Built custom schema with %s fields", len(fields))
                 return state
             except Exception:
                 logger.exception("Failed parsing custom schema spec")
@@ -600,10 +595,10 @@ def build_form_agent_graph():
             low = txt.lower()
             if low in ("yes", "y", "ok", "okay", "confirm", "looks good"):
                 state["schema_confirmed"] = True
-                logger.debug("Schema confirmed by user")
+                _trace("Schema confirmed by user")
                 return state
             if low in ("no", "n", "change", "edit"):
-                logger.debug("User requested schema changes; waiting for specifics")
+                _trace("User requested schema changes; waiting for specifics")
                 return state
             # Simple command parsing
             # theme {json}
@@ -614,7 +609,7 @@ def build_form_agent_graph():
                     obj = json.loads(txt[json_start:json_end])
                     if isinstance(obj, dict):
                         state["theme"] = obj
-                        logger.debug("Applied theme update: %s", obj)
+                        _trace("Applied theme update: %s", obj)
                         return state
                 except Exception:
                     logger.exception("Failed to parse theme JSON")
@@ -631,7 +626,7 @@ def build_form_agent_graph():
                     label = " ".join(key.replace("_", " ").replace("-", " ").split()).title()
                     new_f = {"key": key, "label": label, "type": ftype, "required": req}
                     state["schema"]["fields"].append(new_f)  # type: ignore
-                    logger.debug("Added field: %s", new_f)
+                    _trace("Added field: %s", new_f)
                 except Exception:
                     logger.exception("Failed to add field from spec: %s", txt)
                 return state
@@ -655,24 +650,33 @@ def build_form_agent_graph():
                             continue
                         new_fields.append(f)
                     state["schema"]["fields"] = new_fields  # type: ignore
-                    logger.debug("Removed fields matching '%s' (key=%s): %s", name_raw, name_key, len(removed))
+                    _trace("Removed fields matching '%s' (key=%s): %s", name_raw, name_key, len(removed))
                 except Exception:
                     logger.exception("Failed to remove field from spec: %s", txt)
                 return state
-            # Unrecognized change command; ignore
+            # Unrecognized reply; the intent model may only confirm a short reply that asks for
+            # no edit. Anything else leaves the schema unconfirmed and the question is re-asked.
+            if SCHEMA_EDIT_INTENT.search(txt) or len(txt.split()) > CONFIRM_REPLY_MAX_WORDS:
+                _trace("Schema reply has edit intent; re-asking confirmation")
+                return state
+            if await llm_classify_confirmation(txt) == "yes":
+                state["schema_confirmed"] = True
+                _trace("Schema confirmed by user (intent model)")
             return state
 
         # Not awaiting: capture input and propose suggestion
         # Use schema-driven field lookup
         field_key, _ = FIELDS[idx]
+        field_def: Dict[str, Any] = {"key": field_key}
         if state.get("schema") and isinstance(state["schema"], dict):
             sf = state["schema"].get("fields", [])
             if 0 <= idx < len(sf):
                 field_key = sf[idx].get("key", field_key)
+                field_def = sf[idx]
         # Prefer transient pending_user_text if present; otherwise fall back to last human message
         pending = state.get("pending_user_text")
         messages = list(state.get("messages", []))
-        logger.debug("process_user: idx=%s, field=%s, has_pending=%s, messages=%s", idx, field_key, bool(pending), len(messages))
+        _trace("process_user: idx=%s, field=%s, has_pending=%s, messages=%s", idx, field_key, bool(pending), len(messages))
         content = None
         if pending:
             content = str(pending)
@@ -690,31 +694,33 @@ def build_form_agent_graph():
         if not content:
             return state
 
-        # Try LLM suggestion first, then heuristic normalization
-        suggestion = llm_extract_field_suggestion(field_key, str(content))
-        normalized = normalize_field_value(field_key, suggestion or str(content))
+        # Heuristic answer is ready at once; the LLM only replaces it if it answers within budget
+        normalized = normalize_field_value(field_key, str(content))
+        suggestion = await llm_extract_field_suggestion(field_def, str(content))
+        if suggestion:
+            normalized = normalize_field_value(field_key, suggestion)
         state["awaiting_confirmation"] = True
         state["pending_field_index"] = idx
         state["pending_value"] = normalized
         # Clear transient inputs and messages so checkpoints never hold messages
         state["pending_user_text"] = None
         state["messages"] = []
-        logger.debug("process_user: suggested %s='%s', awaiting confirmation", field_key, normalized)
+        _trace("process_user: suggested %s='%s', awaiting confirmation", field_key, normalized)
         return state
 
 
     def router_node(state: Dict[str, Any]):
         # Pure router: do not mutate persisted state
-        logger.debug("router_node: next=%s, msgs=%s", state.get("next_field_index"), len(state.get("messages", [])))
+        _trace("router_node: next=%s, msgs=%s", state.get("next_field_index"), len(state.get("messages", [])))
         return state
 
     def choose_next(state: Dict[str, Any]):
         if state.get("pending_user_text"):
-            logger.debug("choose_next: pending_user_text present -> process")
+            _trace("choose_next: pending_user_text present -> process")
             return "process"
         messages = state.get("messages", [])
         if not messages:
-            logger.debug("choose_next: no messages -> ask")
+            _trace("choose_next: no messages -> ask")
             return "ask"
         # Scan from the end to find the most recent human/assistant indicator
         for msg in reversed(messages):
@@ -725,9 +731,9 @@ def build_form_agent_graph():
                 role = "user" if msg_type == "human" else "assistant"
             if role in ("user", "assistant"):
                 decision = "process" if role == "user" else "ask"
-                logger.debug("choose_next: recent role=%s -> %s", role, decision)
+                _trace("choose_next: recent role=%s -> %s", role, decision)
                 return decision
-        logger.debug("choose_next: no qualifying role found -> ask")
+        _trace("choose_next: no qualifying role found -> ask")
         return "ask"
 
     async def sanitize_incoming(state: Dict[str, Any]):
@@ -746,11 +752,11 @@ def build_form_agent_graph():
                 if role == "user" and mcontent:
                     content = mcontent
                     break
-        logger.debug("sanitize_incoming: extracted_pending=%s from %s incoming msgs", bool(content), len(msgs))
+        _trace("sanitize_incoming: extracted_pending=%s from %s incoming msgs", bool(content), len(msgs))
         return {"pending_user_text": content, "messages": []}
 
     async def entry_cleanup(state: Dict[str, Any]):
-        logger.debug("entry_cleanup: purge messages at run start")
+        _trace("entry_cleanup: purge messages at run start")
         return {"messages": []}
 
     graph = StateGraph(FormState)
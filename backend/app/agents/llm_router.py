@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+from langchain_openai import ChatOpenAI
+import openai
+
+from app.config.settings import settings
+from app.agents.llm_usage import UsageAggregator, UsageTags, llm_usage
+from app.agents.prompts import approx_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# Task names used by the form agent. Each one gets its own model, token limit and timeout.
+TASK_EXTRACT = "extract"
+TASK_INFER_SCHEMA = "infer_schema"
+TASK_CONFIRM_INTENT = "confirm_intent"
+TASKS = (TASK_EXTRACT, TASK_INFER_SCHEMA, TASK_CONFIRM_INTENT)
+
+# Which path produced a task's answer: the first request, the hedged duplicate, a fallback
+# model after an error, or the caller's heuristic because of the deadline / all models failing.
+OUTCOME_PRIMARY = "primary"
+OUTCOME_HEDGE = "hedge"
+OUTCOME_FALLBACK = "fallback"
+OUTCOME_DEADLINE = "heuristic_deadline"
+OUTCOME_ERROR = "heuristic_error"
+
+_LATENCY_WINDOW = 256
+
+
+@dataclass
+class TaskRoute:
+    task: str
+    models: List[str]
+    max_tokens: int
+    timeout_s: float
+
+
+@dataclass
+class _ModelStats:
+    calls: int = 0
+    successes: int = 0
+    failures: int = 0
+    cancelled: int = 0
+    skipped: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "skipped": self.skipped,
+            "success_rate": round(self.successes / self.calls, 4) if self.calls else None,
+            "avg_latency_ms": round(self.total_latency_ms / self.calls, 3) if self.calls else None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.calls, 1) if self.calls else None,
+            "max_latency_ms": round(self.max_latency_ms, 3),
+        }
+
+
+@dataclass
+class LLMStats:
+    """Per-task / per-model latency and success counters, shared across graphs in the process."""
+
+    models: Dict[Tuple[str, str], _ModelStats] = field(default_factory=dict)
+    outcomes: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    latencies: Dict[str, Deque[float]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _get(self, task: str, model: str) -> _ModelStats:
+        key = (task, model)
+        if key not in self.models:
+            self.models[key] = _ModelStats()
+        return self.models[key]
+
+    def record(
+        self,
+        task: str,
+        model: str,
+        ok: bool,
+        latency_ms: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        with self.lock:
+            st = self._get(task, model)
+            st.calls += 1
+            st.prompt_tokens += prompt_tokens
+            st.completion_tokens += completion_tokens
+            st.total_latency_ms += latency_ms
+            st.max_latency_ms = max(st.max_latency_ms, latency_ms)
+            if ok:
+                st.successes += 1
+                st.consecutive_failures = 0
+                st.open_until = 0.0
+                self._sample(task, latency_ms)
+            else:
+                st.failures += 1
+                st.consecutive_failures += 1
+                if st.consecutive_failures >= settings.llm_failure_threshold:
+                    # Trip the breaker: route around this model for a while
+                    st.open_until = time.monotonic() + settings.llm_cooldown_s
+
+    def record_cancelled(self, task: str, model: str, latency_ms: float) -> None:
+        """A request abandoned after ``latency_ms``: it would have taken at least that long."""
+        with self.lock:
+            self._get(task, model).cancelled += 1
+            self._sample(task, latency_ms)
+
+    def record_latency(self, task: str, latency_ms: float) -> None:
+        """A latency sample for the hedge percentile only, e.g. a request that timed out."""
+        with self.lock:
+            self._sample(task, latency_ms)
+
+    def _sample(self, task: str, latency_ms: float) -> None:
+        self.latencies.setdefault(task, deque(maxlen=_LATENCY_WINDOW)).append(latency_ms / 1000.0)
+
+    def is_open(self, task: str, model: str) -> bool:
+        with self.lock:
+            st = self._get(task, model)
+            if st.open_until and time.monotonic() < st.open_until:
+                st.skipped += 1
+                return True
+            return False
+
+    def record_outcome(self, task: str, outcome: str) -> None:
+        with self.lock:
+            per_task = self.outcomes.setdefault(task, {})
+            per_task[outcome] = per_task.get(outcome, 0) + 1
+
+    def hedge_delay(self, task: str, budget_s: float) -> float:
+        """Seconds to wait before hedging: the configured percentile of recent latencies.
+
+        Samples are successful calls plus the elapsed time of calls that were cancelled or
+        timed out (capped at their budget), so the slow tail is not left out.
+        """
+        with self.lock:
+            samples = sorted(self.latencies.get(task, ()))
+        if len(samples) < settings.llm_hedge_min_samples:
+            delay = budget_s / 2.0
+        else:
+            idx = min(len(samples) - 1, int(settings.llm_hedge_percentile * len(samples)))
+            delay = samples[idx]
+        return max(settings.llm_hedge_min_delay_s, delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            out: Dict[str, Any] = {}
+            for (task, model), st in self.models.items():
+                out.setdefault(task, {"models": {}, "outcomes": {}})["models"][model] = st.snapshot()
+            for task, counts in self.outcomes.items():
+                out.setdefault(task, {"models": {}, "outcomes": {}})["outcomes"] = dict(counts)
+            return out
+
+    def reset(self) -> None:
+        with self.lock:
+            self.models.clear()
+            self.outcomes.clear()
+            self.latencies.clear()
+
+
+llm_stats = LLMStats()
+
+
+def _estimate_prompt_tokens(prompt: Any) -> int:
+    if isinstance(prompt, str):
+        return approx_tokens(prompt)
+    return sum(approx_tokens(str(getattr(m, "content", m))) for m in prompt or [])
+
+
+def build_task_routes() -> Dict[str, TaskRoute]:
+    def models_for(primary: Optional[str]) -> List[str]:
+        chain = [primary or settings.openrouter_model]
+        if settings.llm_fallback_model and settings.llm_fallback_model not in chain:
+            chain.append(settings.llm_fallback_model)
+        return chain
+
+    return {
+        TASK_EXTRACT: TaskRoute(
+            TASK_EXTRACT,
+            models_for(settings.llm_extract_model),
+            settings.llm_extract_max_tokens,
+            settings.llm_extract_timeout_s,
+        ),
+        TASK_INFER_SCHEMA: TaskRoute(
+            TASK_INFER_SCHEMA,
+            models_for(settings.llm_infer_schema_model),
+            settings.llm_infer_schema_max_tokens,
+            settings.llm_infer_schema_timeout_s,
+        ),
+        TASK_CONFIRM_INTENT: TaskRoute(
+            TASK_CONFIRM_INTENT,
+            models_for(settings.llm_confirm_intent_model),
+            settings.llm_confirm_intent_max_tokens,
+            settings.llm_confirm_intent_timeout_s,
+        ),
+    }
+
+
+class LLMRouter:
+    """Routes each LLM task to its configured model chain.
+
+    Models are tried in order (task model, then ``llm_fallback_model``). A model that
+    keeps failing is skipped for ``llm_cooldown_s``. When every model fails or the
+    budget runs out, ``ainvoke`` returns None and the caller falls back to its heuristics.
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, TaskRoute]] = None,
+        stats: Optional[LLMStats] = None,
+        usage: Optional[UsageAggregator] = None,
+    ):
+        self.routes = routes or build_task_routes()
+        self.stats = stats or llm_stats
+        self.usage = usage or llm_usage
+        self._clients: Dict[Tuple[str, int, float], ChatOpenAI] = {}
+
+    def _client(self, model: str, route: TaskRoute) -> ChatOpenAI:
+        key = (model, route.max_tokens, route.timeout_s)
+        client = self._clients.get(key)
+        if client is None:
+            client = ChatOpenAI(
+                model=model,
+                temperature=0.2,
+                max_tokens=route.max_tokens,
+                timeout=route.timeout_s,
+                max_retries=0,
+                api_key=settings.openrouter_api_key,
+                base_url=settings.openrouter_base_url,
+            )
+            self._clients[key] = client
+        return client
+
+    async def _call(
+        self,
+        task: str,
+        model: str,
+        route: TaskRoute,
+        prompt: Any,
+        tags: Optional[UsageTags] = None,
+        budget_s: Optional[float] = None,
+    ) -> Optional[str]:
+        start = time.perf_counter()
+        # Latency samples from abandoned requests are capped at the caller's budget
+        cap_ms = (route.timeout_s if budget_s is None else budget_s) * 1000.0
+        # Estimate up front; replaced by the provider's count when it reports usage
+        prompt_tokens = _estimate_prompt_tokens(prompt)
+        try:
+            resp = await self._client(model, route).ainvoke(prompt)
+        except asyncio.CancelledError:
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            self.stats.record_cancelled(task, model, min(latency_ms, cap_ms))
+            # The request was sent, so its prompt may still be billed
+            self.usage.record(tags, task, model, False, latency_ms, prompt_tokens, cancelled=True)
+            raise
+        except Exception as exc:
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            self.stats.record(task, model, False, latency_ms, prompt_tokens)
+            if isinstance(exc, (openai.APITimeoutError, asyncio.TimeoutError)):
+                self.stats.record_latency(task, min(latency_ms, cap_ms))
+            self.usage.record(tags, task, model, False, latency_ms, prompt_tokens)
+            logger.exception("LLM %s failed on model=%s", task, model)
+            return None
+        content = getattr(resp, "content", None)
+        ok = isinstance(content, str) and bool(content.strip())
+        usage = getattr(resp, "usage_metadata", None) or {}
+        prompt_tokens = int(usage.get("input_tokens") or prompt_tokens)
+        completion_tokens = int(usage.get("output_tokens") or 0)
+        logger.debug("LLM %s model=%s prompt_tokens=%s completion_tokens=%s", task, model, prompt_tokens, completion_tokens)
+        latency_ms = (time.perf_counter() - start) * 1000.0
+        self.stats.record(task, model, ok, latency_ms, prompt_tokens, completion_tokens)
+        self.usage.record(tags, task, model, ok, latency_ms, prompt_tokens, completion_tokens)
+        if not ok:
+            logger.warning("LLM %s: empty response from %s", task, model)
+            return None
+        return content
+
+    async def ainvoke(
+        self,
+        task: str,
+        prompt: Any,
+        budget_s: Optional[float] = None,
+        hedge: bool = False,
+        tags: Optional[UsageTags] = None,
+    ) -> Optional[str]:
+        """Return the first usable answer for ``task`` within ``budget_s`` seconds, else None.
+
+        With ``hedge`` a duplicate request (on the next model in the chain, or the same one)
+        is started once the primary has been outstanding longer than the configured latency
+        percentile. Whichever answers first wins and the rest are cancelled. An erroring
+        request moves on to the next model while budget remains. Every request's tokens
+        are recorded in the usage aggregator under ``tags``.
+        """
+        route = self.routes[task]
+        budget = route.timeout_s if budget_s is None else min(budget_s, route.timeout_s)
+        candidates = [m for m in route.models if not self.stats.is_open(task, m)]
+        if not candidates:
+            logger.debug("LLM %s: all models skipped (breaker open)", task)
+            self.stats.record_outcome(task, OUTCOME_ERROR)
+            return None
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + budget
+        hedge_at = start + self.stats.hedge_delay(task, budget) if hedge else None
+        pending: Dict[asyncio.Future, str] = {}
+        next_model = 0
+
+        def launch(label: str) -> None:
+            nonlocal next_model
+            # Once the chain is exhausted a hedge duplicates the last model
+            model = candidates[min(next_model, len(candidates) - 1)]
+            next_model += 1
+            pending[asyncio.ensure_future(self._call(task, model, route, prompt, tags, budget))] = label
+
+        launch(OUTCOME_PRIMARY)
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    break
+                wait_s = deadline - now
+                if hedge_at is not None:
+                    wait_s = min(wait_s, max(0.0, hedge_at - now))
+                done, _ = await asyncio.wait(list(pending), timeout=wait_s, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedge_at is not None and loop.time() >= hedge_at:
+                        hedge_at = None
+                        logger.debug("LLM %s: hedging after %.3fs", task, loop.time() - start)
+                        launch(OUTCOME_HEDGE)
+                    continue
+                for fut in done:
+                    label = pending.pop(fut)
+                    content = fut.result()
+                    if content:
+                        self.stats.record_outcome(task, label)
+                        return content
+                if not pending and next_model < len(candidates):
+                    launch(OUTCOME_FALLBACK)
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+        outcome = OUTCOME_DEADLINE if pending else OUTCOME_ERROR
+        logger.debug("LLM %s: no answer (%s) after %.3fs", task, outcome, loop.time() - start)
+        self.stats.record_outcome(task, outcome)
+        return None
+
+
+def build_llm_router() -> Optional[LLMRouter]:
+    if not settings.openrouter_api_key:
+        return None
+    try:
+        return LLMRouter()
+    except Exception:
+        logger.exception("LLM router init failed; continuing without LLM")
+        return None
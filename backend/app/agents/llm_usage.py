@@ -0,0 +1,220 @@
+"""Token and cost accounting for LLM calls, by thread, form, field, task and model.
+
+Every call the router makes is recorded with the ``UsageTags`` the caller passed:
+successful and failed calls with their reported token counts, and calls cancelled by
+a hedge or the turn budget with their estimated prompt tokens (the provider may still
+bill them). Cost uses ``llm_prices`` (USD per million prompt / completion tokens).
+
+``GET /api/llm/usage`` serves the cumulative totals; ``UsageRollup`` appends each
+interval's totals to a JSONL file.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+import orjson
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Stand-in dimension values for calls made outside a form field (schema inference, intent)
+NO_FORM = "-"
+NO_FIELD = "-"
+
+
+@dataclass(frozen=True)
+class UsageTags:
+    thread_id: Optional[str] = None
+    form_type: Optional[str] = None
+    field: Optional[str] = None
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prices = settings.llm_prices.get(model)
+    if not prices:
+        return 0.0
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+@dataclass
+class _UsageBucket:
+    calls: int = 0
+    failures: int = 0
+    cancelled: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_ms: float = 0.0
+
+    def add(self, ok: bool, cancelled: bool, prompt_tokens: int, completion_tokens: int, cost: float, latency_ms: float) -> None:
+        self.calls += 1
+        self.failures += 0 if ok or cancelled else 1
+        self.cancelled += 1 if cancelled else 0
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost_usd += cost
+        self.latency_ms += latency_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "avg_latency_ms": round(self.latency_ms / self.calls, 3) if self.calls else None,
+        }
+
+
+@dataclass
+class _UsageTable:
+    total: _UsageBucket = field(default_factory=_UsageBucket)
+    by_task: Dict[str, _UsageBucket] = field(default_factory=dict)
+    by_model: Dict[str, _UsageBucket] = field(default_factory=dict)
+    by_form: Dict[str, _UsageBucket] = field(default_factory=dict)
+    # (form, field, task): the unit an optimization such as caching would target
+    by_field: Dict[Tuple[str, str, str], _UsageBucket] = field(default_factory=dict)
+    # Least recently used first; bounded by llm_usage_max_threads
+    by_thread: "OrderedDict[str, _UsageBucket]" = field(default_factory=OrderedDict)
+
+    def add(self, tags: UsageTags, task: str, model: str, *values: Any) -> None:
+        form = tags.form_type or NO_FORM
+        self.total.add(*values)
+        self.by_task.setdefault(task, _UsageBucket()).add(*values)
+        self.by_model.setdefault(model, _UsageBucket()).add(*values)
+        self.by_form.setdefault(form, _UsageBucket()).add(*values)
+        self.by_field.setdefault((form, tags.field or NO_FIELD, task), _UsageBucket()).add(*values)
+        if tags.thread_id:
+            bucket = self.by_thread.get(tags.thread_id)
+            if bucket is None:
+                bucket = self.by_thread[tags.thread_id] = _UsageBucket()
+                if len(self.by_thread) > settings.llm_usage_max_threads:
+                    self.by_thread.popitem(last=False)
+            else:
+                self.by_thread.move_to_end(tags.thread_id)
+            bucket.add(*values)
+
+    def snapshot(self, top: int) -> Dict[str, Any]:
+        def ranked(buckets: Dict[Any, _UsageBucket], limit: Optional[int] = None) -> List[Tuple[Any, _UsageBucket]]:
+            items = sorted(buckets.items(), key=lambda kv: (kv[1].cost_usd, kv[1].prompt_tokens + kv[1].completion_tokens), reverse=True)
+            return items[:limit] if limit else items
+
+        return {
+            "total": self.total.snapshot(),
+            "by_task": {k: b.snapshot() for k, b in ranked(self.by_task)},
+            "by_model": {k: b.snapshot() for k, b in ranked(self.by_model)},
+            "by_form": {k: b.snapshot() for k, b in ranked(self.by_form)},
+            "by_field": [
+                {"form_type": form, "field": fld, "task": task, **b.snapshot()}
+                for (form, fld, task), b in ranked(self.by_field, top)
+            ],
+            "top_threads": [{"thread_id": t, **b.snapshot()} for t, b in ranked(self.by_thread, top)],
+        }
+
+
+class UsageAggregator:
+    """Cumulative usage plus the current rollup window; safe to call from any thread."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.cumulative = _UsageTable()
+        self.window = _UsageTable()
+        self.window_started = time.time()
+
+    def record(
+        self,
+        tags: Optional[UsageTags],
+        task: str,
+        model: str,
+        ok: bool,
+        latency_ms: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cancelled: bool = False,
+    ) -> None:
+        tags = tags or UsageTags()
+        cost = call_cost(model, prompt_tokens, completion_tokens)
+        values = (ok, cancelled, prompt_tokens, completion_tokens, cost, latency_ms)
+        with self.lock:
+            self.cumulative.add(tags, task, model, *values)
+            self.window.add(tags, task, model, *values)
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        with self.lock:
+            return self.cumulative.snapshot(top)
+
+    def thread(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            bucket = self.cumulative.by_thread.get(thread_id)
+            return bucket.snapshot() if bucket else None
+
+    def drain_window(self, top: int = 20) -> Optional[Dict[str, Any]]:
+        """The window's totals (None if it saw no calls), starting a new window."""
+        with self.lock:
+            window, started = self.window, self.window_started
+            self.window, self.window_started = _UsageTable(), time.time()
+        if not window.total.calls:
+            return None
+        return {"start": started, "end": self.window_started, **window.snapshot(top)}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.cumulative = _UsageTable()
+            self.window = _UsageTable()
+            self.window_started = time.time()
+
+
+llm_usage = UsageAggregator()
+
+
+class UsageRollup:
+    """Appends ``llm_usage``'s window totals to a JSONL file every ``interval_s``."""
+
+    def __init__(self, usage: UsageAggregator, path: str, interval_s: float):
+        self.usage = usage
+        self.path = Path(path)
+        self.interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+
+    def _append(self, line: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as fh:
+            fh.write(line)
+
+    async def flush(self) -> None:
+        window = self.usage.drain_window()
+        if window is None:
+            return
+        try:
+            # File I/O off the event loop
+            await asyncio.to_thread(self._append, orjson.dumps(window) + b"\n")
+        except OSError:
+            logger.exception("Failed to write LLM usage rollup to %s", self.path)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            await self.flush()
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="llm-usage-rollup")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # Last partial window
+        await self.flush()
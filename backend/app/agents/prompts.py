@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+
+# Shared by every extract call, for every form and field. Keep it byte-for-byte stable so
+# provider-side prompt caching can reuse the prefix across requests.
+EXTRACT_SYSTEM_PREFIX = (
+    "You are a field-aware intake assistant for a service desk.\n"
+    "Extract the user's answer for the given field from their message.\n"
+    "- Return only the value, no extra words.\n"
+    "- If allowed values are listed, return exactly one of them.\n"
+    "- For email, return a valid email like user@domain.tld."
+)
+_EXTRACT_SYSTEM_MESSAGE = SystemMessage(content=EXTRACT_SYSTEM_PREFIX)
+
+_TYPE_FORMATS = {
+    "email": "Valid email address.",
+    "number": "A number only, no currency symbols.",
+    "date": "Date as YYYY-MM-DD.",
+    "textarea": "1-3 sentences, no greetings.",
+    "tel": "Phone number digits, optional leading +.",
+}
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting English prompts
+    return len(text) // 4 + 1
+
+
+@dataclass(frozen=True)
+class FieldPrompt:
+    form_type: str
+    field_key: str
+    body: str
+    tokens: int
+
+    def messages(self, raw_text: str) -> List[Any]:
+        return [_EXTRACT_SYSTEM_MESSAGE, HumanMessage(content=f"{self.body}\nMessage: {raw_text}")]
+
+
+def _field_lines(field: Dict[str, Any], kb_field: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    key = str(field.get("key") or "")
+    label = field.get("label") or key.replace("_", " ")
+    head = [f"Field: {label}"]
+    options = field.get("options") or []
+    if options:
+        head.append("Allowed values: " + ", ".join(str(o) for o in options))
+    f_format = kb_field.get("format") or _TYPE_FORMATS.get(str(field.get("type") or "").lower())
+    if f_format:
+        head.append(f"Expected format: {f_format}")
+    examples = [f"- {ex}" for ex in kb_field.get("examples", [])]
+    return head, examples
+
+
+def compile_field_prompt(
+    form_type: str,
+    field: Dict[str, Any],
+    knowledge: Dict[str, Any],
+    max_tokens: int,
+) -> FieldPrompt:
+    """Build the per-field part of the extract prompt, trimmed to ``max_tokens``.
+
+    The system prefix is counted against the budget. Examples are dropped first, then the
+    format line; the field label is always kept.
+    """
+    kb_field = knowledge.get("fields", {}).get(field.get("key"), {}) if knowledge else {}
+    head, examples = _field_lines(field, kb_field)
+    budget = max_tokens - approx_tokens(EXTRACT_SYSTEM_PREFIX)
+
+    def render(h: List[str], ex: List[str]) -> str:
+        return "\n".join(h + (["Examples:"] + ex if ex else []))
+
+    body = render(head, examples)
+    while examples and approx_tokens(body) > budget:
+        examples = examples[:-1]
+        body = render(head, examples)
+    while len(head) > 1 and approx_tokens(body) > budget:
+        head = head[:-1]
+        body = render(head, examples)
+    return FieldPrompt(form_type, str(field.get("key") or ""), body, approx_tokens(EXTRACT_SYSTEM_PREFIX) + approx_tokens(body))
+
+
+class PromptLibrary:
+    """Extract prompts compiled once at load time, keyed by (form_type, field_key)."""
+
+    def __init__(self, forms_manifest: Dict[str, Any], knowledge: Dict[str, Any], max_tokens: int):
+        self.knowledge = knowledge
+        self.max_tokens = max_tokens
+        self.templates: Dict[Tuple[str, str], FieldPrompt] = {}
+        for form_type, schema in (forms_manifest or {}).items():
+            # The knowledge base was written for service_auth; other forms only use its
+            # entries for fields with the same key (name, email)
+            for field in schema.get("fields", []):
+                tpl = compile_field_prompt(form_type, field, knowledge, max_tokens)
+                self.templates[(form_type, tpl.field_key)] = tpl
+        logger.info(
+            "Compiled %s extract prompts (max %s tokens each)",
+            len(self.templates),
+            max((t.tokens for t in self.templates.values()), default=0),
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Extract prompt tokens by form/field: %s", self.token_report())
+
+    def get(self, form_type: Optional[str], field: Dict[str, Any]) -> FieldPrompt:
+        tpl = self.templates.get((form_type or "", str(field.get("key") or "")))
+        if tpl is not None:
+            return tpl
+        # Custom or inferred schemas are compiled on demand (not cached: they differ per thread)
+        return compile_field_prompt(form_type or "custom", field, self.knowledge, self.max_tokens)
+
+    def token_report(self) -> Dict[str, Dict[str, int]]:
+        report: Dict[str, Dict[str, int]] = {}
+        for (form_type, key), tpl in self.templates.items():
+            report.setdefault(form_type, {})[key] = tpl.tokens
+        return report
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST_PATH = Path(__file__).parent / "forms_manifest.json"
+
+
+def load_forms_manifest() -> Dict[str, Any]:
+    try:
+        with open(_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            forms_manifest = json.load(f)
+        logger.info("Loaded forms manifest: %s", list(forms_manifest.keys()))
+        return forms_manifest
+    except Exception:
+        logger.exception("Failed to load forms manifest; proceeding without it")
+        return {}
+
+
+def greeting_text(forms_manifest: Dict[str, Any]) -> str:
+    services_list = []
+    try:
+        for key, val in forms_manifest.items():
+            title = (val.get("title") or key.replace("_", " ").title())
+            # Show as Request per requirement
+            title_req = title.replace("Form", "Request")
+            services_list.append(f"- {title_req} ({key})")
+    except Exception:
+        services_list = []
+    services_text = "\n".join(services_list) if services_list else (
+        "- Service Authorization Request (service_auth)\n"
+        "- Exit Request Request (exit_request)\n"
+        "- Reimbursement Request (reimbursement)\n"
+        "- Bonafide Certificate Request (bonafide_certificate)"
+    )
+    return (
+        "Hi, I'm HelpDesk Assistant. I can help you create and submit IT helpdesk related requests.\n\n"
+        "Here are some requests I can create right away:\n"
+        f"{services_text}\n\n"
+        "Tell me which one you want (e.g., 'reimbursement request') or describe a new form (e.g., 'create a policy request UI'), and I'll build it for you."
+    )
+
+
+def choose_form_text(forms_manifest: Dict[str, Any]) -> str:
+    choices = ", ".join(sorted(forms_manifest.keys())) if forms_manifest else "service_auth"
+    return f"Which form would you like to fill? (choices: {choices})"
+
+
+class StaticReplies:
+    """Replies of ``ask_or_finish`` that depend only on the manifest, computed once.
+
+    ``for_state`` returns the reply a run *without user input* would produce for the given
+    checkpoint values, or None when the graph has to run.
+    """
+
+    def __init__(self, forms_manifest: Dict[str, Any]):
+        self.greeting = greeting_text(forms_manifest)
+        self.choose_form = choose_form_text(forms_manifest)
+
+    def for_state(self, values: Optional[Dict[str, Any]]) -> Optional[str]:
+        values = values or {}
+        if not values.get("greeted"):
+            return self.greeting
+        if not values.get("schema") and not values.get("schema_build_mode"):
+            return self.choose_form
+        return None
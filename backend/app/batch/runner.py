@@ -0,0 +1,224 @@
+"""Offline batch runner: replay recorded conversations through the form agent graph.
+
+Usage (from the backend directory):
+
+    python -m app.batch.runner conversations.jsonl --out results.jsonl --workers 4
+
+Each input line is a JSON object ``{"id": "...", "turns": ["reimbursement", "yes", ...]}``.
+A plain list of strings is also accepted, in which case the line number is used as id.
+Every conversation starts with an empty run (the greeting) just like the Angular client,
+then sends each turn as ``pending_user_text``.
+
+Results are appended to ``--out`` one line per finished conversation, so an interrupted
+batch can be resumed by re-running the same command: ids already present in the output
+file are skipped.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Set
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# One compiled graph (with its own MemorySaver checkpointer) per worker process
+_WORKER_GRAPH = None
+_WORKER_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(log_level: int) -> None:
+    global _WORKER_GRAPH, _WORKER_LOOP
+    logging.basicConfig(level=log_level, format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+    # Imported here so the parent process never builds a graph of its own
+    from app.agents.form_agent import build_form_agent_graph
+
+    _WORKER_GRAPH = build_form_agent_graph()
+    _WORKER_LOOP = asyncio.new_event_loop()
+
+
+def _message_text(msg: Any) -> str:
+    if isinstance(msg, dict):
+        return str(msg.get("content") or "")
+    return str(getattr(msg, "content", "") or "")
+
+
+async def _run_turn(graph, payload: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    reply_parts: List[str] = []
+    start = time.perf_counter()
+    async for update in graph.astream(payload, config, stream_mode="updates"):
+        ask_update = update.get("ask") or {}
+        for msg in ask_update.get("messages", []) or []:
+            reply_parts.append(_message_text(msg))
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    return {"reply": "\n".join(reply_parts) or None, "elapsed_ms": round(elapsed_ms, 3)}
+
+
+async def _run_conversation(graph, conv_id: str, turns: List[str]) -> Dict[str, Any]:
+    # Fresh thread per attempt so a resumed batch never sees stale checkpoints
+    thread_id = f"batch-{conv_id}-{uuid.uuid4().hex[:8]}"
+    config = {"configurable": {"thread_id": thread_id}}
+    timings: List[Dict[str, Any]] = []
+
+    greeting = await _run_turn(graph, {}, config)
+    timings.append({"input": None, **greeting})
+    for text in turns:
+        result = await _run_turn(graph, {"pending_user_text": text}, config)
+        timings.append({"input": text, **result})
+
+    snapshot = await graph.aget_state(config)
+    values = dict(snapshot.values or {})
+    schema = values.get("schema") or {}
+    schema_fields = schema.get("fields", []) if isinstance(schema, dict) else []
+    next_idx = int(values.get("next_field_index") or 0)
+    return {
+        "id": conv_id,
+        "thread_id": thread_id,
+        "form_type": values.get("form_type"),
+        "form": values.get("form") or {},
+        "schema": schema or None,
+        "schema_confirmed": bool(values.get("schema_confirmed")),
+        "done": bool(values.get("schema_confirmed")) and bool(schema_fields) and next_idx >= len(schema_fields),
+        "turns": timings,
+        "total_ms": round(sum(t["elapsed_ms"] for t in timings), 3),
+    }
+
+
+def _worker_run(conv_id: str, turns: List[str]) -> Dict[str, Any]:
+    assert _WORKER_GRAPH is not None and _WORKER_LOOP is not None, "worker not initialized"
+    try:
+        return _WORKER_LOOP.run_until_complete(_run_conversation(_WORKER_GRAPH, conv_id, turns))
+    except Exception as exc:
+        logger.exception("Conversation %s failed", conv_id)
+        return {"id": conv_id, "error": f"{type(exc).__name__}: {exc}", "worker_pid": os.getpid()}
+
+
+def load_conversations(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yields ``{"id", "turns"}`` per input line; a malformed line raises ValueError naming it."""
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"{path}:{lineno}: invalid JSON: {exc.msg}") from None
+            if isinstance(obj, list):
+                obj = {"id": str(lineno), "turns": obj}
+            elif not isinstance(obj, dict):
+                raise ValueError(f"{path}:{lineno}: expected an object or a list of turns, got {type(obj).__name__}")
+            conv_id = str(obj.get("id") or obj.get("thread_id") or lineno)
+            turns = [str(t.get("content", "")) if isinstance(t, dict) else str(t) for t in obj.get("turns", [])]
+            yield {"id": conv_id, "turns": turns}
+
+
+def load_completed_ids(path: Path) -> Set[str]:
+    done: Set[str] = set()
+    if not path.exists():
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial trailing line from an interrupted run; it will be redone
+                continue
+            if "error" not in obj and obj.get("id") is not None:
+                done.add(str(obj["id"]))
+    return done
+
+
+def _truncate_partial_line(path: Path) -> None:
+    """Drops an unterminated last line (a write cut off by an interrupt) so appends start
+    on a fresh line."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(pos, 4096)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            if pos == end and chunk.endswith(b"\n"):
+                return
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                f.truncate(pos - step + newline + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def run_batch(
+    input_path: Path,
+    output_path: Path,
+    workers: int = 1,
+    resume: bool = True,
+    log_level: int = logging.WARNING,
+) -> Dict[str, int]:
+    completed = load_completed_ids(output_path) if resume else set()
+    pending = [c for c in load_conversations(input_path) if c["id"] not in completed]
+    logger.info("Batch: %s pending, %s already completed", len(pending), len(completed))
+    stats = {"completed": 0, "failed": 0, "skipped": len(completed)}
+    if not pending:
+        return stats
+
+    if resume and output_path.exists():
+        _truncate_partial_line(output_path)
+    mode = "a" if resume else "w"
+    with open(output_path, mode, encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=max(1, workers), initializer=_init_worker, initargs=(log_level,)
+    ) as pool:
+        futures: Dict[Future, str] = {pool.submit(_worker_run, c["id"], c["turns"]): c["id"] for c in pending}
+        for fut in as_completed(futures):
+            conv_id = futures[fut]
+            try:
+                result = fut.result()
+            except BrokenProcessPool as exc:
+                # A worker died (OOM, signal); every conversation still queued fails the same
+                # way. They are recorded as failed, so re-running the command redoes them.
+                logger.error("Conversation %s lost: worker process died (%s)", conv_id, exc)
+                result = {"id": conv_id, "error": f"{type(exc).__name__}: {exc}"}
+            except Exception as exc:
+                logger.exception("Conversation %s failed outside the worker", conv_id)
+                result = {"id": conv_id, "error": f"{type(exc).__name__}: {exc}"}
+            out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+            # Flush per conversation so the output file doubles as the resume checkpoint
+            out.flush()
+            stats["failed" if "error" in result else "completed"] += 1
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run recorded conversations through the form agent graph.")
+    parser.add_argument("input", type=Path, help="JSONL file of conversations")
+    parser.add_argument("--out", type=Path, required=True, help="JSONL file for results (also the resume checkpoint)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore and overwrite an existing output file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    log_level = getattr(logging, str(args.log_level).upper(), logging.WARNING)
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        stats = run_batch(args.input, args.out, workers=args.workers, resume=not args.no_resume, log_level=log_level)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    print(json.dumps(stats))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
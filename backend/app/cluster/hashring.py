@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from bisect import bisect
+from typing import Dict, Iterator, List, Set, Tuple
+import hashlib
+
+
+def _hash(value: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """Consistent hash ring with virtual nodes.
+
+    Nodes are never taken off the ring; a node marked down is skipped, so its keys fall
+    through to the next nodes clockwise and return to it as soon as it is marked up again.
+    Keys owned by healthy nodes never move.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        self.nodes = list(nodes)
+        self.down: Set[str] = set()
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes)
+        )
+        self._keys = [p for p, _ in points]
+        self._owners = [n for _, n in points]
+
+    def _walk(self, key: str) -> Iterator[str]:
+        start = bisect(self._keys, _hash(key)) % len(self._keys)
+        seen: Set[str] = set()
+        for i in range(len(self._keys)):
+            node = self._owners[(start + i) % len(self._keys)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+    def owner(self, key: str) -> str:
+        """The node the key maps to when every node is up."""
+        return next(self._walk(key))
+
+    def preference(self, key: str) -> List[str]:
+        """Healthy nodes in the order a request for ``key`` should try them."""
+        return [n for n in self._walk(key) if n not in self.down]
+
+    def mark_down(self, node: str) -> None:
+        self.down.add(node)
+
+    def mark_up(self, node: str) -> None:
+        self.down.discard(node)
+
+    def distribution(self, keys: List[str]) -> Dict[str, int]:
+        counts = {n: 0 for n in self.nodes}
+        for key in keys:
+            prefs = self.preference(key)
+            if prefs:
+                counts[prefs[0]] += 1
+        return counts
@@ -0,0 +1,168 @@
+"""Multi-worker launcher with thread-affinity routing.
+
+Usage (from the backend directory):
+
+    python -m app.cluster.launcher --workers 4 --port 8000
+
+Starts ``--workers`` single-process uvicorn servers for ``main:app`` on local ports and
+serves an affinity proxy on ``--port``. Every /agent and /api/chat request for a thread
+lands on the same worker, so its MemorySaver checkpoints and _THREAD_STATE stay local
+and hot. A worker that exits is marked down (its threads fail over along the hash ring)
+and restarted; once it passes /health it takes its ring share back.
+"""
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Optional
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import sys
+
+import httpx
+import uvicorn
+
+from app.cluster.hashring import ConsistentHashRing
+from app.cluster.proxy import AffinityProxy
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+class Worker:
+    def __init__(self, name: str, port: int):
+        self.name = name
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+
+class WorkerSupervisor:
+    def __init__(self, workers: List[Worker], ring: ConsistentHashRing, proxy_secret: str, app_path: str = "main:app"):
+        self.workers = workers
+        self.ring = ring
+        self.proxy_secret = proxy_secret
+        self.app_path = app_path
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def _spawn(self, worker: Worker) -> None:
+        worker.proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "uvicorn", self.app_path,
+            "--host", "127.0.0.1", "--port", str(worker.port), "--log-level", "warning",
+            cwd=str(BACKEND_DIR),
+            # Lets the worker trust the X-Thread-Id the proxy mints for /api/chat/start
+            env={**os.environ, "CLUSTER_PROXY_SECRET": self.proxy_secret},
+        )
+        logger.info("Started %s (pid %s) on port %s", worker.name, worker.proc.pid, worker.port)
+
+    async def _wait_healthy(self, worker: Worker, timeout_s: float) -> bool:
+        deadline = asyncio.get_running_loop().time() + timeout_s
+        async with httpx.AsyncClient(timeout=1.0) as client:
+            while asyncio.get_running_loop().time() < deadline:
+                if worker.proc is not None and worker.proc.returncode is not None:
+                    return False
+                try:
+                    if (await client.get(worker.url + "/health")).status_code == 200:
+                        return True
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+        return False
+
+    async def _bring_up(self, worker: Worker) -> None:
+        await self._spawn(worker)
+        if await self._wait_healthy(worker, settings.cluster_worker_start_timeout_s):
+            self.ring.mark_up(worker.name)
+            logger.info("%s healthy; back on the ring", worker.name)
+        else:
+            logger.error("%s failed its health check", worker.name)
+
+    async def start(self) -> None:
+        for worker in self.workers:
+            self.ring.mark_down(worker.name)
+        await asyncio.gather(*(self._bring_up(w) for w in self.workers))
+        self._task = asyncio.get_running_loop().create_task(self._watch(), name="worker-supervisor")
+
+    async def _probe(self, client: httpx.AsyncClient, worker: Worker) -> bool:
+        try:
+            return (await client.get(worker.url + "/health")).status_code == 200
+        except httpx.TransportError:
+            return False
+
+    async def _watch(self) -> None:
+        async with httpx.AsyncClient(timeout=1.0) as client:
+            while not self._stopping:
+                for worker in self.workers:
+                    proc = worker.proc
+                    if proc is not None and proc.returncode is not None:
+                        logger.warning("%s exited with %s; rebalancing and restarting", worker.name, proc.returncode)
+                        self.ring.mark_down(worker.name)
+                        worker.restarts += 1
+                        await self._bring_up(worker)
+                    elif worker.name in self.ring.down and await self._probe(client, worker):
+                        # Still running but marked down (proxy transport error, slow first
+                        # health check): put it back once it answers
+                        self.ring.mark_up(worker.name)
+                        logger.info("%s healthy again; back on the ring", worker.name)
+                await asyncio.sleep(settings.cluster_supervise_interval_s)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+        for worker in self.workers:
+            if worker.proc is not None and worker.proc.returncode is None:
+                worker.proc.terminate()
+        for worker in self.workers:
+            if worker.proc is not None:
+                try:
+                    await asyncio.wait_for(worker.proc.wait(), timeout=10)
+                except asyncio.TimeoutError:
+                    worker.proc.kill()
+
+
+def build_cluster(n_workers: int, base_port: int, app_path: str = "main:app"):
+    workers = [Worker(f"worker-{i}", base_port + i) for i in range(n_workers)]
+    ring = ConsistentHashRing([w.name for w in workers], vnodes=settings.cluster_virtual_nodes)
+    proxy_secret = secrets.token_urlsafe(32)
+    proxy = AffinityProxy(ring, {w.name: w.url for w in workers}, proxy_secret)
+    supervisor = WorkerSupervisor(workers, ring, proxy_secret, app_path=app_path)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await supervisor.start()
+        try:
+            yield
+        finally:
+            await supervisor.stop()
+            await proxy.aclose()
+
+    proxy.app.router.lifespan_context = lifespan
+    return proxy, supervisor
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run main:app on several workers with thread-affinity routing.")
+    parser.add_argument("--workers", type=int, default=settings.cluster_workers)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-base-port", type=int, default=settings.cluster_worker_base_port)
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.INFO), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    proxy, _ = build_cluster(args.workers, args.worker_base_port, app_path=args.app)
+    uvicorn.run(proxy.app, host=args.host, port=args.port, log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+import itertools
+import logging
+import uuid
+
+import httpx
+import orjson
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from app.cluster.hashring import ConsistentHashRing
+
+logger = logging.getLogger(__name__)
+
+THREAD_ID_HEADER = "x-thread-id"
+# Shared with the workers the launcher starts; a worker only adopts X-Thread-Id with it
+PROXY_SECRET_HEADER = "x-cluster-proxy-secret"
+
+# Hop-by-hop headers and ones httpx/uvicorn recompute
+_DROP_REQUEST_HEADERS = {
+    "host", "content-length", "connection", "keep-alive", "transfer-encoding", THREAD_ID_HEADER, PROXY_SECRET_HEADER,
+}
+_DROP_RESPONSE_HEADERS = {"content-length", "connection", "keep-alive", "transfer-encoding"}
+
+
+def thread_key(path: str, body: bytes) -> Optional[str]:
+    """threadId / thread_id of an /agent or /api/chat request, if any."""
+    if not body or not (path == "/agent" or path.startswith("/api/chat/")):
+        return None
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    key = data.get("threadId") or data.get("thread_id")
+    return str(key) if key else None
+
+
+class AffinityProxy:
+    """Routes each thread's requests to the same worker by consistent hashing.
+
+    ``/api/chat/start`` has no thread id yet, so the proxy always mints one (ignoring
+    anything the client sent), routes by it and passes it on in ``X-Thread-Id`` with the
+    shared ``secret`` for the worker to adopt. When a thread's worker is
+    down its requests go to the next worker on the ring; threads first seen during the
+    outage are pinned there (bounded LRU) so they don't move back, and lose their state,
+    when the worker returns.
+    """
+
+    def __init__(
+        self,
+        ring: ConsistentHashRing,
+        workers: Dict[str, str],
+        secret: str,
+        max_pins: int = 100_000,
+        timeout_s: float = 120.0,
+    ):
+        self.ring = ring
+        self.workers = workers
+        self.secret = secret
+        self.max_pins = max_pins
+        self._pins: "OrderedDict[str, str]" = OrderedDict()
+        self._round_robin = itertools.cycle(list(workers))
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(timeout_s, connect=2.0), limits=httpx.Limits(max_connections=None))
+        self.routed: Dict[str, int] = {name: 0 for name in workers}
+        self.app = Starlette(routes=[Route("/{path:path}", self.handle, methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])])
+
+    def _candidates(self, key: Optional[str]) -> Iterable[str]:
+        if key is None:
+            # No affinity needed: spread across healthy workers
+            first = next(self._round_robin)
+            order = [first] + [n for n in self.workers if n != first]
+            return [n for n in order if n not in self.ring.down]
+        pinned = self._pins.get(key)
+        prefs = self.ring.preference(key)
+        if pinned is not None and pinned in prefs:
+            self._pins.move_to_end(key)
+            return [pinned] + [n for n in prefs if n != pinned]
+        return prefs
+
+    def _pin_if_displaced(self, key: Optional[str], worker: str) -> None:
+        if key is None or worker == self.ring.owner(key) or key in self._pins:
+            return
+        self._pins[key] = worker
+        if len(self._pins) > self.max_pins:
+            self._pins.popitem(last=False)
+
+    async def handle(self, request: Request) -> Response:
+        body = await request.body()
+        path = request.url.path
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in _DROP_REQUEST_HEADERS}
+        if path == "/api/chat/start":
+            # Always minted here; a thread id in the client's body or headers is ignored
+            key: Optional[str] = str(uuid.uuid4())
+            headers[THREAD_ID_HEADER] = key
+            headers[PROXY_SECRET_HEADER] = self.secret
+        else:
+            key = thread_key(path, body)
+
+        for worker in self._candidates(key):
+            url = httpx.URL(self.workers[worker] + path, query=request.url.query.encode("utf-8"))
+            upstream = self.client.build_request(request.method, url, headers=headers, content=body)
+            try:
+                resp = await self.client.send(upstream, stream=True)
+            except httpx.TransportError:
+                # Dead before the supervisor noticed; fail over and let it restart the worker
+                logger.warning("Worker %s unreachable; marking down", worker)
+                self.ring.mark_down(worker)
+                continue
+            self._pin_if_displaced(key, worker)
+            self.routed[worker] += 1
+            out_headers = {k: v for k, v in resp.headers.items() if k.lower() not in _DROP_RESPONSE_HEADERS}
+            return StreamingResponse(
+                resp.aiter_raw(),
+                status_code=resp.status_code,
+                headers=out_headers,
+                background=BackgroundTask(resp.aclose),
+            )
+        return Response(b'{"error":"no_worker_available"}', status_code=503, media_type="application/json", headers={"Retry-After": "1"})
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -6,11 +6,84 @@ class Settings(BaseSettings):
     api_prefix: str = "/api"
     cors_origins: list[str] = ["http://localhost:4200", "http://127.0.0.1:4200", "*"]
 
+    # Response compression (large state snapshots); off by default
+    gzip_enabled: bool = False
+    gzip_min_bytes: int = 2048
+    gzip_level: int = 6
+
+    # Opt-in profiling: header or sampling rate enables a stack sampler per request
+    profiling_enabled: bool = False
+    profiling_header: str = "x-profile"
+    profiling_sample_rate: float = 0.0
+    profiling_interval_ms: float = 1.0
+    profiling_dir: str = "profiles"
+    # Logging: records are queued and written by a background thread
+    log_level: str = "INFO"
+    log_json: bool = True
+    log_file: str | None = None
+    log_queue_size: int = 10000
+    # Fraction of runs whose per-turn debug trace is kept (all of them at log_level DEBUG)
+    log_trace_sample_rate: float = 0.0
+    # Event loop lag monitor
+    loop_lag_monitor_enabled: bool = False
+    loop_lag_interval_s: float = 0.1
+    loop_lag_threshold_ms: float = 100.0
+
+    # Serve manifest-only replies (greeting, form choice) without running the graph
+    static_replies_enabled: bool = True
+    # Threads greeted from memory whose checkpoint is still pending (LRU bound)
+    static_replies_max_pending: int = 10000
+
+    # /agent admission control and run lifecycle
+    agent_max_concurrent_runs: int = 64
+    agent_retry_after_s: int = 1
+    agent_heartbeat_s: float = 15.0
+    agent_idle_timeout_s: float = 60.0
+
+    # Multi-worker launcher (python -m app.cluster.launcher)
+    cluster_workers: int = 2
+    cluster_worker_base_port: int = 8100
+    cluster_virtual_nodes: int = 64
+    cluster_worker_start_timeout_s: float = 60.0
+    cluster_supervise_interval_s: float = 0.5
+    # Set by the launcher for its workers; without it X-Thread-Id from callers is ignored
+    cluster_proxy_secret: str | None = None
+
     # OpenRouter
     openrouter_api_key: str | None = None
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
     openrouter_model: str = "meta-llama/llama-3.1-8b-instruct:free"
 
+    # Task-based model routing (unset model -> openrouter_model)
+    llm_extract_model: str | None = None
+    llm_extract_max_tokens: int = 64
+    llm_extract_timeout_s: float = 8.0
+    # Token budget for a compiled extract prompt (system prefix + field block)
+    llm_extract_prompt_max_tokens: int = 160
+    llm_infer_schema_model: str | None = None
+    llm_infer_schema_max_tokens: int = 1024
+    llm_infer_schema_timeout_s: float = 30.0
+    llm_confirm_intent_model: str | None = None
+    llm_confirm_intent_max_tokens: int = 8
+    llm_confirm_intent_timeout_s: float = 5.0
+    llm_fallback_model: str | None = None
+    # Consecutive failures before a model is skipped, and for how long
+    llm_failure_threshold: int = 3
+    llm_cooldown_s: float = 60.0
+    # Per-turn latency budget for LLM assistance; the heuristic answer is used past it
+    llm_turn_budget_s: float = 3.0
+    # Hedge a second extract request once the first exceeds this latency percentile
+    llm_hedge_enabled: bool = True
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_samples: int = 20
+    llm_hedge_min_delay_s: float = 0.25
+    # Token/cost accounting: USD per million [prompt, completion] tokens by model (unlisted = free)
+    llm_prices: dict[str, list[float]] = {}
+    llm_usage_max_threads: int = 10000
+    # Interval totals appended as JSON lines; 0 disables the rollup
+    llm_usage_rollup_path: str = "usage/llm_usage.jsonl"
+    llm_usage_rollup_interval_s: float = 60.0
+
     class Config:
         env_file = ".env"
 
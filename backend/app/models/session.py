@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+ROLE_ASSISTANT = "assistant"
+ROLE_USER = "user"
+
+# (role, field index of an assistant prompt | user text)
+HistoryEntry = Tuple[str, Union[int, str]]
+
+
+class ChatSession:
+    """Compact state of one /api/chat thread.
+
+    Assistant turns are stored as the index of the prompt in ``fields`` instead of a copy
+    of its text, field values live in a fixed-size list indexed by field position, and the
+    field table itself is shared by every session.
+    """
+
+    __slots__ = ("fields", "values", "next_field_index", "history")
+
+    def __init__(self, fields: Sequence[Tuple[str, str]]):
+        self.fields = fields
+        self.values: List[Optional[str]] = [None] * len(fields)
+        self.next_field_index = 0
+        self.history: List[HistoryEntry] = []
+
+    @property
+    def done(self) -> bool:
+        return self.next_field_index >= len(self.fields)
+
+    def ask(self, idx: int) -> Tuple[str, str]:
+        self.history.append((ROLE_ASSISTANT, idx))
+        return self.fields[idx]
+
+    def answer(self, text: str) -> None:
+        self.history.append((ROLE_USER, text))
+        idx = self.next_field_index
+        if idx < len(self.fields):
+            self.values[idx] = text
+            self.next_field_index = idx + 1
+
+    @property
+    def form(self) -> Dict[str, str]:
+        return {self.fields[i][0]: v for i, v in enumerate(self.values) if v is not None}
@@ -0,0 +1,148 @@
+"""Non-blocking, structured logging for the app.
+
+``configure_logging()`` routes every record through a bounded queue to a
+``QueueListener`` thread that does the formatting and I/O, so a slow stderr or disk
+never stalls the event loop. A full queue drops records (counted) instead of blocking.
+
+Records carry the thread_id/run_id bound with ``bind_log_context()``. Per-turn debug traces
+are sampled per run: ``trace_enabled(logger)`` is true only for sampled runs, and hot
+paths check it before building their debug arguments at all.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import copy
+import logging
+import queue
+import random
+import sys
+
+import orjson
+
+from app.config.settings import settings
+
+_thread_id: ContextVar[Optional[str]] = ContextVar("log_thread_id", default=None)
+_run_id: ContextVar[Optional[str]] = ContextVar("log_run_id", default=None)
+_traced: ContextVar[bool] = ContextVar("log_traced", default=False)
+
+# Until configure_logging() runs (batch runner, scripts), debug follows the logger level
+_trace_all = True
+
+# Loggers whose handlers are swapped for the queue (their default ones write synchronously)
+_SERVER_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+def trace_enabled(logger: logging.Logger) -> bool:
+    """Whether per-turn debug records from ``logger`` would be kept for this run."""
+    return (_trace_all or _traced.get()) and logger.isEnabledFor(logging.DEBUG)
+
+
+def bind_log_context(thread_id: Optional[str] = None, run_id: Optional[str] = None) -> bool:
+    """Binds thread/run ids to records logged from the current task and decides whether
+    its debug trace is sampled. Call it at the top of a task that owns its context (a
+    request handler, the run pump); tasks it spawns inherit the binding."""
+    traced = settings.log_trace_sample_rate > 0 and random.random() < settings.log_trace_sample_rate
+    _thread_id.set(thread_id)
+    _run_id.set(run_id)
+    _traced.set(traced)
+    return traced
+
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler that stamps context, drops unsampled debug records and never blocks."""
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolate now (args may be mutable state), format in the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.thread_id = _thread_id.get()
+        record.run_id = _run_id.get()
+        return record
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and not (_trace_all or _traced.get()):
+            return False
+        return super().handle(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        thread_id = getattr(record, "thread_id", None)
+        if thread_id:
+            entry["thread_id"] = thread_id
+        run_id = getattr(record, "run_id", None)
+        if run_id:
+            entry["run_id"] = run_id
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(name)s%(context)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        thread_id = getattr(record, "thread_id", None)
+        record.context = f" [{thread_id}]" if thread_id else ""
+        return super().format(record)
+
+
+def configure_logging() -> QueueListener:
+    """Installs the queue handler on the root logger and starts the writer thread.
+
+    The caller stops the returned listener at shutdown to flush what is queued.
+    """
+    global _trace_all
+    level = logging.getLevelName(settings.log_level.upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+    _trace_all = level <= logging.DEBUG
+
+    if settings.log_file:
+        sink: logging.Handler = logging.FileHandler(settings.log_file, encoding="utf-8")
+    else:
+        sink = logging.StreamHandler(sys.stderr)
+    sink.setFormatter(JsonFormatter() if settings.log_json else TextFormatter())
+
+    handler = ContextQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    if not _trace_all and settings.log_trace_sample_rate > 0:
+        # App loggers emit debug so sampled runs can trace; the handler drops the rest
+        logging.getLogger("app").setLevel(logging.DEBUG)
+    for name in _SERVER_LOGGERS:
+        server_logger = logging.getLogger(name)
+        server_logger.handlers = []
+        server_logger.propagate = True
+
+    listener = QueueListener(handler.queue, sink, respect_handler_level=True)
+    listener.start()
+    return listener
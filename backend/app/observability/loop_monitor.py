@@ -0,0 +1,92 @@
+"""Event loop lag monitor.
+
+A heartbeat coroutine ticks every ``loop_lag_interval_s``. A watchdog thread checks the
+heartbeat; when it is older than ``loop_lag_threshold_ms`` the loop is blocked, and the
+watchdog logs the loop thread's current stack (innermost app frame first, which for
+graph work is the node function, e.g. ``process_user``). The heartbeat also logs the
+total lag once the loop recovers.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+_APP_ROOT = str(Path(__file__).resolve().parents[1])
+_OWN_DIR = str(Path(__file__).resolve().parent)
+
+
+def _describe_stack(thread_id: int) -> str:
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return "<no frame>"
+    stack = traceback.extract_stack(frame)
+    # Innermost app frame outside this package: the graph node or route doing the work
+    app_frames = [f for f in stack if f.filename.startswith(_APP_ROOT) and not f.filename.startswith(_OWN_DIR)]
+    where = f"{stack[-1].name} ({Path(stack[-1].filename).name}:{stack[-1].lineno})"
+    if app_frames:
+        where += f", app frame {Path(app_frames[-1].filename).name}:{app_frames[-1].name}"
+    return f"{where}\n" + "".join(traceback.format_list(stack[-12:]))
+
+
+class LoopLagMonitor:
+    def __init__(self, interval_s: float, threshold_ms: float):
+        self.interval_s = interval_s
+        self.threshold_s = threshold_ms / 1000.0
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def _tick(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag_ms = (now - expected) * 1000.0
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms >= self.threshold_s * 1000.0:
+                self.stalls += 1
+                logger.warning("Event loop lag %.1f ms", lag_ms)
+
+    def _watch(self) -> None:
+        reported_for = 0.0
+        while not self._stop.wait(self.threshold_s / 2.0):
+            beat = self._heartbeat
+            blocked_s = time.monotonic() - beat - self.interval_s
+            # One stack dump per stall
+            if blocked_s >= self.threshold_s and beat != reported_for and self._loop_thread_id is not None:
+                reported_for = beat
+                logger.warning(
+                    "Event loop blocked for %.1f ms in %s",
+                    blocked_s * 1000.0, _describe_stack(self._loop_thread_id),
+                )
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._tick(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
@@ -0,0 +1,105 @@
+"""Opt-in per-request sampling profiler.
+
+Only installed when ``profiling_enabled`` is set, so a disabled profiler costs nothing.
+A request is profiled when it carries the ``profiling_header`` (e.g. ``X-Profile: 1``)
+or is picked by ``profiling_sample_rate``. While it runs, a background thread samples
+the event loop thread's Python stack every ``profiling_interval_ms`` and writes the
+result as collapsed stacks (``.folded``), readable by flamegraph.pl, inferno or
+speedscope.
+
+Samples cover everything running on the event loop during the request, which under
+concurrency can include other requests' work.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILED_PATHS = ("/agent", "/api/chat/respond")
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, target_thread_id: int, interval_s: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval_s = interval_s
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is not None:
+                self.samples[_collapse(frame)] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.profiling_header.lower().encode("latin-1")
+        self.out_dir = Path(settings.profiling_dir)
+
+    def _wanted(self, scope: Scope) -> Optional[str]:
+        if scope["type"] != "http" or scope.get("path") not in PROFILED_PATHS:
+            return None
+        for name, value in scope.get("headers", []):
+            if name == self.header and value not in (b"", b"0", b"false"):
+                return "header"
+        if settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        reason = self._wanted(scope)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+        sampler = StackSampler(threading.get_ident(), settings.profiling_interval_ms / 1000.0)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.stop()
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['path'].strip('/').replace('/', '_')}-{uuid.uuid4().hex[:8]}.folded"
+            try:
+                sampler.write(self.out_dir / name)
+                logger.info(
+                    "Profiled %s (%s): %.1f ms, %s samples -> %s",
+                    scope["path"], reason, elapsed_ms, sum(sampler.samples.values()), self.out_dir / name,
+                )
+            except Exception:
+                logger.exception("Failed to write profile for %s", scope["path"])
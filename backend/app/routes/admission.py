@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional, Set
+
+from starlette.responses import StreamingResponse
+
+REJECT_BUSY = "busy"
+REJECT_THREAD_BUSY = "thread_busy"
+
+OUTCOME_FINISHED = "finished"
+OUTCOME_ERROR = "error"
+OUTCOME_IDLE_TIMEOUT = "idle_timeout"
+OUTCOME_DISCONNECTED = "disconnected"
+
+
+class RunTicket:
+    """One admitted run. Released exactly once, whichever way the run ends."""
+
+    __slots__ = ("_admission", "thread_id", "outcome", "_released")
+
+    def __init__(self, admission: "RunAdmission", thread_id: Optional[str]):
+        self._admission = admission
+        self.thread_id = thread_id
+        # Set by the event pump; a run that never got to stream counts as disconnected
+        self.outcome = OUTCOME_DISCONNECTED
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._admission._release(self)
+
+
+class RunAdmission:
+    """Caps concurrent /agent runs, and allows one run at a time per thread.
+
+    Checking and admitting happen without an await in between, so on one event loop
+    no lock is needed.
+    """
+
+    def __init__(self, max_runs: int):
+        self.max_runs = max_runs
+        self.active = 0
+        self._threads: Set[str] = set()
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {REJECT_BUSY: 0, REJECT_THREAD_BUSY: 0}
+        self.outcomes: Dict[str, int] = {
+            OUTCOME_FINISHED: 0,
+            OUTCOME_ERROR: 0,
+            OUTCOME_IDLE_TIMEOUT: 0,
+            OUTCOME_DISCONNECTED: 0,
+        }
+
+    def rejection(self, thread_id: Optional[str]) -> Optional[str]:
+        """Why a run for ``thread_id`` can't start now, or None if it can."""
+        if thread_id and thread_id in self._threads:
+            # A second run would race the first on the same checkpoint
+            return REJECT_THREAD_BUSY
+        if self.active >= self.max_runs:
+            return REJECT_BUSY
+        return None
+
+    def reject(self, reason: str) -> None:
+        self.rejected[reason] += 1
+
+    def admit(self, thread_id: Optional[str]) -> RunTicket:
+        self.active += 1
+        self.admitted += 1
+        if thread_id:
+            self._threads.add(thread_id)
+        return RunTicket(self, thread_id)
+
+    def _release(self, ticket: RunTicket) -> None:
+        self.active -= 1
+        if ticket.thread_id:
+            self._threads.discard(ticket.thread_id)
+        self.outcomes[ticket.outcome] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "active": self.active,
+            "max": self.max_runs,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "outcomes": dict(self.outcomes),
+        }
+
+
+class RunStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs ``on_close`` however the response ends.
+
+    The body generator's ``finally`` is not enough: if the client goes away before the
+    body is first iterated, the generator never starts and its cleanup never runs.
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._on_close()
@@ -1,20 +1,116 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from typing import Callable
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+import hmac
 import uuid
-from ag_ui_langgraph import add_langgraph_fastapi_endpoint, LangGraphAgent
+from ag_ui.core import RunAgentInput
+from ag_ui.encoder import EventEncoder
+from ag_ui_langgraph import LangGraphAgent
 from app.agents.form_agent import build_form_agent_graph, FIELDS
+from app.agents.llm_router import llm_stats
+from app.agents.llm_usage import llm_usage
+from app.agents.static_replies import StaticReplies, load_forms_manifest
+from app.config.settings import settings
+from app.models.session import ChatSession
+from app.observability.logs import bind_log_context
+from app.cluster.proxy import PROXY_SECRET_HEADER, THREAD_ID_HEADER
+from app.routes.admission import REJECT_THREAD_BUSY, RunAdmission, RunStreamingResponse
+from app.routes.encoding import GzipStream
+from app.routes.run_lifecycle import HEARTBEAT, HEARTBEAT_BYTES, MessageCoercingGraph, guarded_events
+from app.routes.static_runs import StaticRunShortCircuit
 
 router = APIRouter()
 
 
 graph = build_form_agent_graph()
-agui_agent = LangGraphAgent(name="form-agent", graph=graph)
+# Both the agent and the static short circuit read thread state back through the coercion
+agent_graph = MessageCoercingGraph(graph)
+static_runs = StaticRunShortCircuit(
+    agent_graph, StaticReplies(load_forms_manifest()), max_pending=settings.static_replies_max_pending
+)
+run_admission = RunAdmission(settings.agent_max_concurrent_runs)
+
+
+def new_agent() -> LangGraphAgent:
+    # LangGraphAgent keeps per-run state on the instance (active_run), so concurrent
+    # runs each need their own; construction is a few attribute writes
+    return LangGraphAgent(name="form-agent", graph=agent_graph)
+
+
+def add_agent_endpoint(
+    app,
+    agent_factory: Callable[[], LangGraphAgent],
+    path: str = "/agent",
+    short_circuit: StaticRunShortCircuit | None = None,
+    admission: RunAdmission | None = None,
+):
+    # Same contract as ag_ui_langgraph.add_langgraph_fastapi_endpoint, with optional gzip
+    # of the event stream, static replies served from memory, and admission control with heartbeats, idle timeout and cleanup on disconnect
+    admission = admission or RunAdmission(settings.agent_max_concurrent_runs)
+
+    @app.post(path)
+    async def langgraph_agent_endpoint(input_data: RunAgentInput, request: Request):
+        thread_id = input_data.thread_id
+        reason = admission.rejection(thread_id)
+        if reason is not None:
+            # Fail fast; a queued run would only hold the connection open
+            admission.reject(reason)
+            return ORJSONResponse(
+                {"error": reason},
+                status_code=429 if reason == REJECT_THREAD_BUSY else 503,
+                headers={"Retry-After": str(settings.agent_retry_after_s)},
+            )
+        ticket = admission.admit(thread_id)
+        encoder = EventEncoder()
+        use_gzip = settings.gzip_enabled and "gzip" in request.headers.get("accept-encoding", "")
+
+        async def run_events():
+            # Iterated by the run's pump task, so the binding stays with this run
+            bind_log_context(thread_id, input_data.run_id)
+            static_events = await short_circuit.resolve(input_data) if short_circuit else None
+            if static_events is not None:
+                for event in static_events:
+                    yield event
+                return
+            async for event in agent_factory().run(input_data):
+                yield event
+
+        async def event_generator():
+            gz = GzipStream(settings.gzip_level) if use_gzip else None
+            events = guarded_events(run_events(), ticket, settings.agent_heartbeat_s, settings.agent_idle_timeout_s)
+            try:
+                async for event in events:
+                    chunk = HEARTBEAT_BYTES if event is HEARTBEAT else encoder.encode(event).encode("utf-8")
+                    yield gz.compress(chunk) if gz else chunk
+                if gz:
+                    yield gz.finish()
+            finally:
+                await events.aclose()
+                # Release as soon as the last event is out; the client may send the
+                # thread's next turn before the response object itself has wound down
+                ticket.release()
+
+        headers = {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"} if use_gzip else None
+        return RunStreamingResponse(
+            event_generator(),
+            on_close=ticket.release,
+            media_type=encoder.get_content_type(),
+            headers=headers,
+        )
+
+    return app
 
 
 def include_agent_routes(app):
     # Mount AG-UI-compatible streaming endpoint
-    add_langgraph_fastapi_endpoint(app, agui_agent, "/agent")
+    add_agent_endpoint(
+        app,
+        new_agent,
+        "/agent",
+        short_circuit=static_runs if settings.static_replies_enabled else None,
+        admission=run_admission,
+    )
     app.include_router(router)
     return app
 
@@ -40,59 +136,84 @@ class RespondResponse(BaseModel):
     form: dict | None = None
 
 
-_THREAD_STATE: dict[str, dict] = {}
+_THREAD_STATE: dict[str, ChatSession] = {}
+
+
+@router.get("/api/llm/stats")
+async def get_llm_stats():
+    # Per-task / per-model latency and success rates, plus which path (LLM, hedge, heuristic) won
+    return ORJSONResponse(llm_stats.snapshot())
+
+
+@router.get("/api/llm/usage")
+async def get_llm_usage(thread_id: str | None = None, top: int = 20):
+    # Tokens and cost by task, model, form, (form, field, task) and the costliest threads
+    if thread_id is not None:
+        usage = llm_usage.thread(thread_id)
+        if usage is None:
+            return ORJSONResponse({"error": "unknown_thread"}, status_code=404)
+        return ORJSONResponse({"thread_id": thread_id, **usage})
+    return ORJSONResponse(llm_usage.snapshot(top))
+
+
+@router.get("/api/agent/runs")
+async def get_agent_runs():
+    # Active runs, rejections and how admitted runs ended (finished, error, idle, disconnect)
+    return ORJSONResponse(run_admission.snapshot())
+
+
+def proxy_thread_id(request: Request) -> str | None:
+    # Behind the affinity proxy the thread id is minted there, so it can route by it.
+    # The header is only honored with the secret the launcher shares with the proxy.
+    secret = request.headers.get(PROXY_SECRET_HEADER)
+    if not settings.cluster_proxy_secret or not secret:
+        return None
+    if not hmac.compare_digest(secret.encode("utf-8"), settings.cluster_proxy_secret.encode("utf-8")):
+        return None
+    return request.headers.get(THREAD_ID_HEADER)
 
 
 @router.post("/api/chat/start", response_model=StartChatResponse)
-async def start_chat():
-    thread_id = str(uuid.uuid4())
-    state = {"messages": [], "form": {}, "next_field_index": 0}
-    _THREAD_STATE[thread_id] = state
-    # Ask first question
+async def start_chat(request: Request):
+    thread_id = proxy_thread_id(request) or str(uuid.uuid4())
+    if thread_id in _THREAD_STATE:
+        # Never let a start replace an existing session
+        return ORJSONResponse({"error": "thread_exists"}, status_code=409)
+    bind_log_context(thread_id)
+    session = ChatSession(FIELDS)
+    _THREAD_STATE[thread_id] = session
     # First question
-    prompt = FIELDS[0][1]
-    state["messages"].append({"role": "assistant", "content": prompt})
-    field_key = FIELDS[0][0]
+    field_key, prompt = session.ask(0)
     return StartChatResponse(thread_id=thread_id, message=prompt, field_key=field_key)
 
 
 @router.post("/api/chat/respond", response_model=RespondResponse)
 async def respond_chat(req: RespondRequest):
-    state = _THREAD_STATE.get(req.thread_id)
-    if not state:
-        return JSONResponse({"error": "invalid_thread"}, status_code=400)
-    # Add user's message
-    state.setdefault("messages", []).append({"role": "user", "content": req.message})
-    idx = state.get("next_field_index", 0)
-    if idx < len(FIELDS):
-        field_key, _ = FIELDS[idx]
-        state.setdefault("form", {})[field_key] = req.message
-        state["next_field_index"] = idx + 1
+    bind_log_context(req.thread_id)
+    session = _THREAD_STATE.get(req.thread_id)
+    if not session:
+        return ORJSONResponse({"error": "invalid_thread"}, status_code=400)
+    # Record user's answer for the current field
+    session.answer(req.message)
 
     # Next prompt or finish
-    next_index = state.get("next_field_index", 0)
-    done = bool(next_index >= len(FIELDS))
-    if done:
-        _THREAD_STATE[req.thread_id] = state
+    if session.done:
+        form = session.form
         return RespondResponse(
             thread_id=req.thread_id,
             message="Thank you. All required details have been collected.",
             done=True,
             field_key=None,
-            form_partial=state.get("form"),
-            form=state.get("form"),
+            form_partial=form,
+            form=form,
         )
     # Ask next
-    next_field_key, next_prompt = FIELDS[next_index]
-    state.setdefault("messages", []).append({"role": "assistant", "content": next_prompt})
-    _THREAD_STATE[req.thread_id] = state
+    next_field_key, next_prompt = session.ask(session.next_field_index)
     return RespondResponse(
         thread_id=req.thread_id,
         message=next_prompt,
         done=False,
         field_key=next_field_key,
-        form_partial=state.get("form"),
+        form_partial=session.form,
         form=None,
     )
-
-
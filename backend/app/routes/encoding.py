@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import zlib
+
+
+class GzipStream:
+    """Incremental gzip for a streamed response; each chunk is sync-flushed so SSE events
+    are delivered immediately instead of waiting for the compressor's buffer to fill."""
+
+    def __init__(self, level: int = 6) -> None:
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._z.compress(chunk) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush(zlib.Z_FINISH)
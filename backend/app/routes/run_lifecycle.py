@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from contextlib import suppress
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List
+import asyncio
+import logging
+
+from ag_ui.core import EventType, RunErrorEvent
+from langchain_core.messages import AIMessage, BaseMessage, convert_to_messages
+
+from app.routes.admission import (
+    OUTCOME_DISCONNECTED,
+    OUTCOME_ERROR,
+    OUTCOME_FINISHED,
+    OUTCOME_IDLE_TIMEOUT,
+    RunTicket,
+)
+
+logger = logging.getLogger(__name__)
+
+# Yielded by guarded_events when the run has been quiet for a heartbeat interval
+HEARTBEAT = object()
+HEARTBEAT_BYTES = b": ping\n\n"
+
+_DONE = object()
+# Events buffered ahead of a slow client before the graph is paused
+_QUEUE_SIZE = 32
+
+
+def coerce_messages(messages: List[Any]) -> List[BaseMessage]:
+    """LangChain messages for ``messages``, converting any plain dicts."""
+    out: List[BaseMessage] = []
+    for msg in messages:
+        if isinstance(msg, BaseMessage):
+            out.append(msg)
+            continue
+        try:
+            out.extend(convert_to_messages([msg]))
+        except (ValueError, NotImplementedError):
+            content = msg.get("content", "") if isinstance(msg, dict) else msg
+            out.append(AIMessage(content=str(content or "")))
+    return out
+
+
+class MessageCoercingGraph:
+    """Wraps the compiled graph so state read back by LangGraphAgent only holds messages.
+
+    ``langchain_messages_to_agui`` raises on a dict, which used to kill the stream after
+    the run's work was already done and checkpointed.
+    """
+
+    def __init__(self, graph: Any):
+        self._graph = graph
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._graph, name)
+
+    async def aget_state(self, config: Dict[str, Any], *args: Any, **kwargs: Any) -> Any:
+        state = await self._graph.aget_state(config, *args, **kwargs)
+        values = state.values
+        messages = values.get("messages") if isinstance(values, dict) else None
+        if messages and not all(isinstance(m, BaseMessage) for m in messages):
+            logger.warning("Coercing %s non-message entries in thread state", sum(not isinstance(m, BaseMessage) for m in messages))
+            state = state._replace(values={**values, "messages": coerce_messages(messages)})
+        return state
+
+
+async def guarded_events(
+    events: AsyncGenerator[Any, None],
+    ticket: RunTicket,
+    heartbeat_s: float,
+    idle_timeout_s: float,
+) -> AsyncIterator[Any]:
+    """Relays a run's events with heartbeats, an idle timeout and guaranteed cleanup.
+
+    The run is pumped by its own task, so waiting for the next event can time out
+    without cancelling the graph mid-step. A run that fails or goes idle ends with a
+    RUN_ERROR event instead of a broken stream. When the client disconnects (this
+    generator is cancelled or closed), the pump is cancelled and the run closed.
+    ``ticket.outcome`` records how the run ended.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+
+    async def pump() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+            await queue.put(_DONE)
+        except Exception as exc:
+            await queue.put(exc)
+        finally:
+            await events.aclose()
+
+    task = loop.create_task(pump(), name="agent-run")
+    last_event = loop.time()
+    try:
+        while True:
+            idle_left = idle_timeout_s - (loop.time() - last_event)
+            if idle_left <= 0:
+                logger.warning("Run idle for %.0fs; cancelling", idle_timeout_s)
+                ticket.outcome = OUTCOME_IDLE_TIMEOUT
+                yield RunErrorEvent(type=EventType.RUN_ERROR, message="Run timed out waiting for the agent", code=OUTCOME_IDLE_TIMEOUT)
+                return
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=min(heartbeat_s, idle_left))
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+            if item is _DONE:
+                ticket.outcome = OUTCOME_FINISHED
+                return
+            if isinstance(item, Exception):
+                logger.error("Agent run failed", exc_info=item)
+                ticket.outcome = OUTCOME_ERROR
+                yield RunErrorEvent(type=EventType.RUN_ERROR, message="The agent run failed", code=OUTCOME_ERROR)
+                return
+            last_event = loop.time()
+            yield item
+    except (asyncio.CancelledError, GeneratorExit):
+        ticket.outcome = OUTCOME_DISCONNECTED
+        raise
+    finally:
+        if not task.done():
+            task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
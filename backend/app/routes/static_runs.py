@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import logging
+import uuid
+
+from ag_ui.core import (
+    EventType,
+    MessagesSnapshotEvent,
+    RunAgentInput,
+    RunFinishedEvent,
+    RunStartedEvent,
+    StateSnapshotEvent,
+)
+from ag_ui_langgraph.utils import langchain_messages_to_agui
+from langchain_core.messages import AIMessage
+
+from app.agents.static_replies import StaticReplies
+
+logger = logging.getLogger(__name__)
+
+
+def _has_user_input(input_data: RunAgentInput) -> bool:
+    state = input_data.state if isinstance(input_data.state, dict) else {}
+    if state.get("pending_user_text"):
+        return True
+    if any(getattr(m, "role", None) == "user" for m in input_data.messages or []):
+        return True
+    props = input_data.forwarded_props if isinstance(input_data.forwarded_props, dict) else {}
+    return bool((props.get("command") or {}).get("resume"))
+
+
+class StaticRunShortCircuit:
+    """Serves runs whose reply is fixed by the manifest without running the graph.
+
+    A run with no user input on a new thread (the client's ``start()``) gets the greeting
+    from memory; its checkpoint is only written when the thread's first real turn
+    arrives. A run with no user input on a greeted thread with no form chosen gets the
+    "Which form..." prompt and leaves the checkpoint untouched.
+
+    Pending greetings are kept for the ``max_pending`` most recent threads; most belong
+    to abandoned page loads. An evicted greeting is dropped, never checkpointed: a reload
+    of that thread is greeted again under a new message id, and a first turn runs the
+    graph on a checkpoint without the greeting in its history.
+    """
+
+    def __init__(self, graph: Any, replies: StaticReplies, max_pending: int = 10_000):
+        self.graph = graph
+        self.replies = replies
+        self.max_pending = max_pending
+        # thread_id -> id of the greeting message served but not yet checkpointed (LRU)
+        self._lazy_greeted: "OrderedDict[str, str]" = OrderedDict()
+        self.served = 0
+        self.materialized = 0
+        self.evicted = 0
+
+    async def _materialize(self, thread_id: str, config: Dict[str, Any]) -> None:
+        msg_id = self._lazy_greeted.pop(thread_id, None)
+        if msg_id is None:
+            return
+        # Same writes the greeting run would have checkpointed, attributed to the last node
+        await self.graph.aupdate_state(
+            config,
+            {"messages": [AIMessage(content=self.replies.greeting, id=msg_id)], "greeted": True},
+            as_node="cleanup",
+        )
+        self.materialized += 1
+
+    async def resolve(self, input_data: RunAgentInput) -> Optional[List[Any]]:
+        """Events for a static reply, or None when the graph has to run."""
+        thread_id = input_data.thread_id
+        if not thread_id:
+            return None
+        config = {"configurable": {"thread_id": thread_id}}
+        if _has_user_input(input_data):
+            await self._materialize(thread_id, config)
+            return None
+
+        if thread_id in self._lazy_greeted:
+            self._lazy_greeted.move_to_end(thread_id)
+            greeting = AIMessage(content=self.replies.greeting, id=self._lazy_greeted[thread_id])
+            values: Dict[str, Any] = {"messages": [greeting], "greeted": True}
+        else:
+            snapshot = await self.graph.aget_state(config)
+            if snapshot.next:
+                # Interrupted mid-run; let the agent resume it
+                return None
+            values = dict(snapshot.values or {})
+
+        reply = self.replies.for_state(values)
+        if reply is None:
+            return None
+        msg = AIMessage(content=reply, id=str(uuid.uuid4()))
+        if not values.get("greeted"):
+            self._lazy_greeted[thread_id] = msg.id
+            if len(self._lazy_greeted) > self.max_pending:
+                self._lazy_greeted.popitem(last=False)
+                self.evicted += 1
+        messages = list(values.get("messages") or []) + [msg]
+        state = {**values, "messages": messages, "greeted": True, "pending_user_text": None}
+        self.served += 1
+        logger.debug("Static reply for thread %s (greeted=%s)", thread_id, bool(values.get("greeted")))
+        run_id = input_data.run_id or str(uuid.uuid4())
+        return [
+            RunStartedEvent(type=EventType.RUN_STARTED, thread_id=thread_id, run_id=run_id),
+            StateSnapshotEvent(type=EventType.STATE_SNAPSHOT, snapshot=state),
+            MessagesSnapshotEvent(type=EventType.MESSAGES_SNAPSHOT, messages=langchain_messages_to_agui(messages)),
+            RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id=thread_id, run_id=run_id),
+        ]
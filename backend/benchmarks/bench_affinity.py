@@ -0,0 +1,131 @@
+"""Single worker vs affinity-routed workers vs plain ``uvicorn --workers``.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_affinity --workers 4 --conversations 200 --concurrency 32
+
+Each setup is started as a subprocess and driven with concurrent /agent conversations
+(start, pick a form, confirm, answer). Reports turns/s, p50/p95 turn latency, and how many
+conversations lost their state (a turn landing on a worker without the thread) or had a
+turn fail outright.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+from app.cluster.launcher import BACKEND_DIR
+
+TURNS = ["reimbursement", "yes", "my name is Priya Kapoor", "yes", "priya@company.co", "yes"]
+
+
+def agent_body(thread_id: str, text: str | None) -> Dict:
+    return {
+        "threadId": thread_id,
+        "runId": str(uuid.uuid4()),
+        "state": {"pending_user_text": text} if text else {},
+        "messages": [],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {"node_name": "entry_cleanup", "command": {}},
+    }
+
+
+async def conversation(client: httpx.AsyncClient, latencies: List[float]) -> bool:
+    thread_id = str(uuid.uuid4())
+    last = ""
+    for text in [None] + TURNS:
+        start = time.perf_counter()
+        try:
+            resp = await client.post("/agent", json=agent_body(thread_id, text))
+        except httpx.HTTPError:
+            # A stream the server broke off counts against the setup, not the harness
+            return False
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        last = resp.text
+    # Name and email confirmed: only a worker that kept the whole thread asks for the amount
+    return "amount to reimburse" in last
+
+
+async def drive(base_url: str, conversations: int, concurrency: int) -> Tuple[float, List[float], int]:
+    latencies: List[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def one() -> bool:
+            async with sem:
+                return await conversation(client, latencies)
+
+        start = time.perf_counter()
+        # Summed from the results: a shared counter bumped after an await lost increments
+        kept = await asyncio.gather(*(one() for _ in range(conversations)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, conversations - sum(kept)
+
+
+def wait_healthy(url: str, timeout_s: float = 90.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if httpx.get(url + "/health", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"{url} did not become healthy")
+
+
+def run_setup(label: str, cmd: List[str], port: int, args) -> None:
+    proc = subprocess.Popen(cmd, cwd=str(BACKEND_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_healthy(url)
+        time.sleep(1.0)  # let every worker finish booting
+        elapsed, latencies, lost = asyncio.run(drive(url, args.conversations, args.concurrency))
+        qs = statistics.quantiles(latencies, n=20)
+        print(
+            f"  {label:<22} {len(latencies) / elapsed:8.1f} turns/s   p50 {statistics.median(latencies):7.1f} ms"
+            f"   p95 {qs[18]:7.1f} ms   lost/failed {lost}/{args.conversations}"
+        )
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    py = sys.executable
+    print(f"{args.conversations} conversations x {len(TURNS) + 1} turns, concurrency {args.concurrency}")
+    run_setup("single worker", [py, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"], args.port, args)
+    run_setup(
+        f"affinity x{args.workers}",
+        [py, "-m", "app.cluster.launcher", "--workers", str(args.workers), "--port", str(args.port),
+         "--worker-base-port", str(args.port + 100), "--log-level", "warning"],
+        args.port,
+        args,
+    )
+    run_setup(
+        f"uvicorn --workers {args.workers}",
+        [py, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+        args.port,
+        args,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Per-turn latency of the form graph under different logging setups.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_logging --conversations 100 --sink-delay-ms 0.5
+
+Drives ``--conversations`` scripted conversations through the graph with a log sink
+that takes ``--sink-delay-ms`` per write (a busy terminal, pipe or disk), comparing:
+a synchronous DEBUG handler, the queued setup tracing every run, and the queued setup
+sampling ``--sample-rate`` of runs.
+"""
+from __future__ import annotations
+
+from typing import List
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import sys
+import time
+import uuid
+
+from app.agents.form_agent import build_form_agent_graph
+from app.config.settings import settings
+from app.observability.logs import bind_log_context, configure_logging
+
+TURNS = ["reimbursement", "yes", "my name is Priya Kapoor", "yes", "priya@company.co", "yes"]
+
+
+class SlowStream(io.TextIOBase):
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.writes = 0
+
+    def write(self, s: str) -> int:
+        # Blocking, like a write to a full pipe or a slow disk
+        time.sleep(self.delay_s)
+        self.writes += 1
+        return len(s)
+
+
+async def drive(graph, conversations: int) -> List[float]:
+    latencies: List[float] = []
+    for _ in range(conversations):
+        thread_id = str(uuid.uuid4())
+        config = {"configurable": {"thread_id": thread_id}}
+        bind_log_context(thread_id)
+        for text in [None] + TURNS:
+            start = time.perf_counter()
+            await graph.ainvoke({"pending_user_text": text} if text else {"messages": []}, config)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def reset_root() -> None:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.getLogger("app").setLevel(logging.NOTSET)
+
+
+def report(label: str, latencies: List[float], sink: SlowStream) -> None:
+    print(
+        f"  {label:<24} mean {statistics.fmean(latencies):7.2f} ms   p95 {statistics.quantiles(latencies, n=20)[18]:7.2f} ms"
+        f"   {sink.writes:6d} lines written"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.5)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    graph = build_form_agent_graph()
+    asyncio.run(drive(graph, 2))  # warm up
+    print(f"{args.conversations} conversations x {len(TURNS) + 1} turns, sink {args.sink_delay_ms} ms/write")
+
+    sink = SlowStream(args.sink_delay_ms / 1000.0)
+    reset_root()
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.DEBUG)
+    report("sync handler, DEBUG", asyncio.run(drive(graph, args.conversations)), sink)
+
+    real_stderr = sys.stderr
+    for label, level, rate in (
+        ("queued, DEBUG", "DEBUG", 0.0),
+        (f"queued, {args.sample_rate:.0%} traced", "INFO", args.sample_rate),
+    ):
+        sink = SlowStream(args.sink_delay_ms / 1000.0)
+        reset_root()
+        settings.log_level, settings.log_trace_sample_rate, settings.log_file = level, rate, None
+        sys.stderr = sink
+        try:
+            listener = configure_logging()
+            latencies = asyncio.run(drive(graph, args.conversations))
+            listener.stop()
+        finally:
+            sys.stderr = real_stderr
+        report(label, latencies, sink)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Serialization benchmark: the /agent event stream and JSON responses.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_serialization
+
+Measures, for a typical manifest schema and a very large custom schema:
+- one /agent stream's worth of events (STATE_SNAPSHOT + RAW pairs) through
+  ``ag_ui.encoder.EventEncoder``, which the endpoint uses as is;
+- a JSON response body through ``JSONResponse`` vs ``ORJSONResponse``;
+- gzip ratio of the encoded stream.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+import argparse
+import gzip
+import json
+import time
+from pathlib import Path
+
+from ag_ui.core import EventType, RawEvent, StateSnapshotEvent, StepStartedEvent
+from ag_ui.encoder import EventEncoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from langchain_core.messages import AIMessage
+
+_MANIFEST = Path(__file__).resolve().parents[1] / "app" / "agents" / "forms_manifest.json"
+
+
+def typical_state() -> Dict[str, Any]:
+    manifest = json.loads(_MANIFEST.read_text(encoding="utf-8"))
+    schema = manifest["service_auth"]
+    return {
+        "messages": [AIMessage(content=f["prompt"], id=f"m{i}") for i, f in enumerate(schema["fields"])],
+        "form": {"name": "Priya Kapoor", "email": "priya.kapoor@company.co", "issue_details": "VPN drops hourly"},
+        "next_field_index": 3,
+        "asked_index": 3,
+        "pending_user_text": None,
+        "awaiting_confirmation": False,
+        "schema": schema,
+        "form_type": "service_auth",
+        "schema_confirmed": True,
+        "theme": {"primary": "#0052cc"},
+        "greeted": True,
+    }
+
+
+def large_state(n_fields: int = 400, n_messages: int = 300) -> Dict[str, Any]:
+    fields = [
+        {
+            "key": f"field_{i}",
+            "label": f"Field {i}",
+            "type": "select" if i % 3 == 0 else "text",
+            "required": i % 2 == 0,
+            "options": [f"option_{j}" for j in range(12)] if i % 3 == 0 else None,
+            "prompt": f"Please provide the value for field {i}, following the documented format.",
+        }
+        for i in range(n_fields)
+    ]
+    state = typical_state()
+    state["schema"] = {"title": "Large custom form", "fields": fields}
+    state["form_type"] = "large_custom"
+    state["form"] = {f"field_{i}": f"value {i} " * 8 for i in range(n_fields // 2)}
+    state["messages"] = [AIMessage(content=f"Prompt number {i} " * 10, id=f"m{i}") for i in range(n_messages)]
+    return state
+
+
+def stream_events(state: Dict[str, Any], nodes: int = 6) -> List[Any]:
+    # Mirrors what LangGraphAgent emits per node: STEP_STARTED, STATE_SNAPSHOT with the
+    # raw LangGraph event, then the same raw event as RAW. Only one node changes state.
+    events: List[Any] = []
+    for i in range(nodes):
+        snap = dict(state)
+        if i == 3:
+            snap["next_field_index"] = state["next_field_index"] + 1
+            state = snap
+        raw = {"event": "on_chain_end", "name": f"node{i}", "data": {"input": state, "output": snap}}
+        events.append(StepStartedEvent(type=EventType.STEP_STARTED, step_name=f"node{i}"))
+        events.append(StateSnapshotEvent(type=EventType.STATE_SNAPSHOT, snapshot=snap, raw_event=raw))
+        events.append(RawEvent(type=EventType.RAW, event=raw))
+    events.append(StateSnapshotEvent(type=EventType.STATE_SNAPSHOT, snapshot=dict(state)))
+    return events
+
+
+def _time(fn, repeat: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def bench(label: str, state: Dict[str, Any], repeat: int) -> None:
+    events = stream_events(state)
+
+    def stream() -> bytes:
+        enc = EventEncoder()
+        return b"".join(enc.encode(e).encode("utf-8") for e in events)
+
+    body = {k: v for k, v in state.items() if k != "messages"}
+    stream_ms = _time(stream, repeat)
+    json_ms = _time(lambda: JSONResponse(body), repeat)
+    orjson_ms = _time(lambda: ORJSONResponse(body), repeat)
+    raw = stream()
+    print(f"[{label}] {len(events)} events, {len(raw) / 1024:.1f} KiB per stream")
+    print(f"  stream  EventEncoder   {stream_ms:8.3f} ms")
+    print(f"  json    JSONResponse   {json_ms:8.3f} ms")
+    print(f"  json    ORJSONResponse {orjson_ms:8.3f} ms  ({json_ms / orjson_ms:.1f}x)")
+    print(f"  gzip    {len(gzip.compress(raw, 6)) / len(raw):.1%} of original")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    bench("typical", typical_state(), args.repeat)
+    bench("large", large_state(), max(1, args.repeat // 10))
+
+
+if __name__ == "__main__":
+    main()
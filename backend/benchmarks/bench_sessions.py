@@ -0,0 +1,72 @@
+"""Bytes per /api/chat session: the old nested-dict state vs ChatSession.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_sessions --sessions 100000
+
+Builds ``--sessions`` sessions the way /api/chat/start and /api/chat/respond do, each
+with ``--answers`` user answers (distinct strings per session, as in production), and
+reports the memory they hold, measured with tracemalloc. Thread-id keys are included.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+import argparse
+import gc
+import tracemalloc
+import uuid
+
+from app.agents.form_agent import FIELDS
+from app.models.session import ChatSession
+
+
+def legacy_session(answers: int, seed: int) -> Dict[str, Any]:
+    # Shape of the previous _THREAD_STATE entries
+    state: Dict[str, Any] = {"messages": [], "form": {}, "next_field_index": 0}
+    state["messages"].append({"role": "assistant", "content": FIELDS[0][1]})
+    for i in range(answers):
+        text = f"answer {seed} {i}"
+        state["messages"].append({"role": "user", "content": text})
+        state["form"][FIELDS[i][0]] = text
+        state["next_field_index"] = i + 1
+        if i + 1 < len(FIELDS):
+            state["messages"].append({"role": "assistant", "content": FIELDS[i + 1][1]})
+    return state
+
+
+def compact_session(answers: int, seed: int) -> ChatSession:
+    session = ChatSession(FIELDS)
+    session.ask(0)
+    for i in range(answers):
+        session.answer(f"answer {seed} {i}")
+        if not session.done:
+            session.ask(session.next_field_index)
+    return session
+
+
+def measure(label: str, factory, sessions: int, answers: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    store = {str(uuid.uuid4()): factory(answers, n) for n in range(sessions)}
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_session = used / sessions
+    print(f"  {label:<12} {per_session:8.0f} B/session   {used / 1024 / 1024:8.1f} MiB total")
+    del store
+    return per_session
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--answers", type=int, default=3, help=f"answers per session (0-{len(FIELDS)})")
+    args = parser.parse_args()
+    print(f"{args.sessions} sessions, {args.answers} answers each")
+    legacy = measure("dict state", legacy_session, args.sessions, args.answers)
+    compact = measure("ChatSession", compact_session, args.sessions, args.answers)
+    print(f"  saved        {legacy - compact:8.0f} B/session ({1 - compact / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Latency and memory per new session: greeting run through the graph vs served from memory.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_static_replies --sessions 500
+
+Each side uses a fresh graph (and MemorySaver), opens ``--sessions`` new threads with the
+client's ``start()`` run, and encodes the events as the /agent endpoint would. Memory is
+what stays allocated afterwards (checkpoints vs the lazy-greeting table), measured with
+tracemalloc in a second, untimed pass.
+"""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, List
+import argparse
+import asyncio
+import gc
+import logging
+import time
+import tracemalloc
+import uuid
+
+from ag_ui.core import RunAgentInput
+from ag_ui.encoder import EventEncoder
+from ag_ui_langgraph import LangGraphAgent
+
+from app.agents.form_agent import build_form_agent_graph
+from app.agents.static_replies import StaticReplies, load_forms_manifest
+from app.routes.static_runs import StaticRunShortCircuit
+
+
+def start_input(thread_id: str) -> RunAgentInput:
+    return RunAgentInput(
+        thread_id=thread_id,
+        run_id=str(uuid.uuid4()),
+        state={},
+        messages=[],
+        tools=[],
+        context=[],
+        forwarded_props={"node_name": "entry_cleanup", "command": {}},
+    )
+
+
+async def measure(label: str, sessions: int, new_session: Callable[[str], Awaitable[List[bytes]]]) -> None:
+    await new_session("warmup")
+    # Timed without tracemalloc, which slows allocation-heavy code considerably
+    start = time.perf_counter()
+    for _ in range(sessions):
+        await new_session(str(uuid.uuid4()))
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(sessions):
+        await new_session(str(uuid.uuid4()))
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"  {label:<14} {elapsed_ms / sessions:8.3f} ms/session   {retained / sessions / 1024:8.2f} KiB retained/session")
+
+
+async def main(sessions: int) -> None:
+    logging.disable(logging.CRITICAL)
+    replies = StaticReplies(load_forms_manifest())
+
+    agent = LangGraphAgent(name="bench", graph=build_form_agent_graph())
+
+    async def via_graph(thread_id: str) -> List[bytes]:
+        enc = EventEncoder()
+        return [enc.encode(e).encode("utf-8") async for e in agent.run(start_input(thread_id))]
+
+    short_circuit = StaticRunShortCircuit(build_form_agent_graph(), replies)
+
+    async def via_static(thread_id: str) -> List[bytes]:
+        enc = EventEncoder()
+        events: Any = await short_circuit.resolve(start_input(thread_id))
+        return [enc.encode(e).encode("utf-8") for e in events]
+
+    print(f"New sessions: {sessions}")
+    await measure("graph run", sessions, via_graph)
+    await measure("static reply", sessions, via_static)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions))
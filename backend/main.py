@@ -1,13 +1,42 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
+from app.agents.llm_usage import UsageRollup, llm_usage
 from app.config.settings import settings
 from app.routes.agent import include_agent_routes
+from app.observability.logs import configure_logging
+from app.observability.loop_monitor import LoopLagMonitor
+from app.observability.profiling import ProfilingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener = configure_logging()
+    monitor = None
+    if settings.loop_lag_monitor_enabled:
+        monitor = LoopLagMonitor(settings.loop_lag_interval_s, settings.loop_lag_threshold_ms)
+        monitor.start()
+    rollup = None
+    if settings.llm_usage_rollup_interval_s > 0:
+        rollup = UsageRollup(llm_usage, settings.llm_usage_rollup_path, settings.llm_usage_rollup_interval_s)
+        rollup.start()
+    try:
+        yield
+    finally:
+        if monitor is not None:
+            await monitor.stop()
+        if rollup is not None:
+            await rollup.stop()
+        # Flush queued records before the process exits
+        log_listener.stop()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.app_name)
+    app = FastAPI(title=settings.app_name, default_response_class=ORJSONResponse, lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -16,12 +45,18 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if settings.gzip_enabled:
+        # JSON responses only; the /agent stream compresses itself with per-event flushes
+        app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_min_bytes, compresslevel=settings.gzip_level)
+    if settings.profiling_enabled:
+        # Not installed at all when disabled, so there is no per-request cost
+        app.add_middleware(ProfilingMiddleware)
 
     include_agent_routes(app)
 
     @app.get("/health")
     async def health():
-        return JSONResponse({"status": "ok"})
+        return ORJSONResponse({"status": "ok"})
 
     return app
 
@@ -0,0 +1,193 @@
+import asyncio
+import json
+from collections import namedtuple
+
+import pytest
+from ag_ui.core import EventType, RunAgentInput, RunFinishedEvent, RunStartedEvent
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.agents.static_replies import StaticReplies, load_forms_manifest
+from app.config.settings import settings
+from app.routes.admission import (
+    OUTCOME_DISCONNECTED,
+    OUTCOME_ERROR,
+    OUTCOME_FINISHED,
+    OUTCOME_IDLE_TIMEOUT,
+    REJECT_BUSY,
+    REJECT_THREAD_BUSY,
+    RunAdmission,
+)
+from app.routes.agent import add_agent_endpoint
+from app.routes.run_lifecycle import HEARTBEAT, MessageCoercingGraph, guarded_events
+from app.routes.static_runs import StaticRunShortCircuit
+
+
+def body(thread_id="t1"):
+    return {"threadId": thread_id, "runId": "r1", "state": {}, "messages": [], "tools": [], "context": [], "forwardedProps": {}}
+
+
+def started(thread_id="t1"):
+    return RunStartedEvent(type=EventType.RUN_STARTED, thread_id=thread_id, run_id="r1")
+
+
+def finished(thread_id="t1"):
+    return RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id=thread_id, run_id="r1")
+
+
+class FakeAgent:
+    """Stands in for LangGraphAgent: yields ``events``, then raises ``error`` or hangs."""
+
+    def __init__(self, events=(), error=None, hang=False):
+        self.events = list(events)
+        self.error = error
+        self.hang = hang
+        self.closed = False
+
+    async def run(self, input_data):
+        try:
+            for event in self.events:
+                yield event
+            if self.error is not None:
+                raise self.error
+            if self.hang:
+                await asyncio.Event().wait()
+        finally:
+            self.closed = True
+
+
+def make_app(agent, max_runs=1):
+    app = FastAPI()
+    admission = RunAdmission(max_runs)
+    add_agent_endpoint(app, lambda: agent, "/agent", admission=admission)
+    return app, admission
+
+
+def sse_types(text):
+    return [json.loads(line[len("data: "):])["type"] for line in text.splitlines() if line.startswith("data: ")]
+
+
+@pytest.fixture(autouse=True)
+def fast_timeouts(monkeypatch):
+    monkeypatch.setattr(settings, "agent_heartbeat_s", 0.05)
+    monkeypatch.setattr(settings, "agent_idle_timeout_s", 0.2)
+    monkeypatch.setattr(settings, "gzip_enabled", False)
+
+
+def test_admission_rejects_a_busy_thread_before_a_full_server():
+    admission = RunAdmission(1)
+    ticket = admission.admit("t1")
+    assert admission.rejection("t1") == REJECT_THREAD_BUSY
+    assert admission.rejection("t2") == REJECT_BUSY
+    ticket.release()
+    ticket.release()
+    assert admission.active == 0
+    assert admission.rejection("t1") is None
+    assert admission.outcomes[OUTCOME_DISCONNECTED] == 1
+
+
+def test_busy_thread_gets_429_and_full_server_503():
+    app, admission = make_app(FakeAgent([started(), finished()]))
+    ticket = admission.admit("t1")
+    with TestClient(app) as client:
+        same_thread = client.post("/agent", json=body("t1"))
+        other_thread = client.post("/agent", json=body("t2"))
+    assert (same_thread.status_code, same_thread.json()) == (429, {"error": REJECT_THREAD_BUSY})
+    assert (other_thread.status_code, other_thread.json()) == (503, {"error": REJECT_BUSY})
+    assert other_thread.headers["retry-after"] == str(settings.agent_retry_after_s)
+    ticket.release()
+    assert admission.snapshot()["rejected"] == {REJECT_BUSY: 1, REJECT_THREAD_BUSY: 1}
+
+
+def test_finished_run_releases_its_slot():
+    app, admission = make_app(FakeAgent([started(), finished()]))
+    with TestClient(app) as client:
+        resp = client.post("/agent", json=body())
+    assert sse_types(resp.text) == ["RUN_STARTED", "RUN_FINISHED"]
+    assert admission.active == 0 and admission.outcomes[OUTCOME_FINISHED] == 1
+
+
+def test_failed_run_ends_with_run_error_and_releases_its_slot():
+    agent = FakeAgent([started()], error=RuntimeError("boom"))
+    app, admission = make_app(agent)
+    with TestClient(app) as client:
+        resp = client.post("/agent", json=body())
+    assert resp.status_code == 200
+    assert sse_types(resp.text) == ["RUN_STARTED", "RUN_ERROR"]
+    assert admission.active == 0 and admission.outcomes[OUTCOME_ERROR] == 1
+    assert agent.closed
+
+
+def test_idle_run_gets_heartbeats_then_times_out_and_releases_its_slot():
+    agent = FakeAgent([started()], hang=True)
+    app, admission = make_app(agent)
+    with TestClient(app) as client:
+        resp = client.post("/agent", json=body())
+    assert ": ping" in resp.text
+    assert sse_types(resp.text) == ["RUN_STARTED", "RUN_ERROR"]
+    assert admission.active == 0 and admission.outcomes[OUTCOME_IDLE_TIMEOUT] == 1
+    assert agent.closed
+
+
+def test_client_disconnect_cancels_the_run_and_releases_its_slot(monkeypatch):
+    monkeypatch.setattr(settings, "agent_idle_timeout_s", 30.0)
+    agent = FakeAgent([started()], hang=True)
+    app, admission = make_app(agent)
+
+    async def drive():
+        first_chunk = asyncio.Event()
+        request = json.dumps(body()).encode()
+        sent_request = False
+
+        async def receive():
+            nonlocal sent_request
+            if not sent_request:
+                sent_request = True
+                return {"type": "http.request", "body": request, "more_body": False}
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                first_chunk.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/agent", "raw_path": b"/agent", "query_string": b"",
+            "root_path": "", "headers": [(b"content-type", b"application/json")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+    asyncio.run(drive())
+    assert admission.active == 0 and admission.outcomes[OUTCOME_DISCONNECTED] == 1
+    assert agent.closed
+
+
+def test_guarded_events_relays_heartbeats_while_the_run_is_quiet():
+    async def slow():
+        await asyncio.sleep(0.12)
+        yield started()
+
+    async def collect():
+        ticket = RunAdmission(1).admit("t1")
+        return [e async for e in guarded_events(slow(), ticket, 0.05, 1.0)], ticket
+
+    events, ticket = asyncio.run(collect())
+    assert events[:2] == [HEARTBEAT, HEARTBEAT]
+    assert events[-1].type == EventType.RUN_STARTED
+    assert ticket.outcome == OUTCOME_FINISHED
+
+
+def test_static_runs_read_state_through_the_message_coercion():
+    Snapshot = namedtuple("Snapshot", "values next")
+
+    class DictMessageGraph:
+        # Checkpoint holding a plain dict message, as older threads can
+        async def aget_state(self, config):
+            return Snapshot({"greeted": True, "messages": [{"role": "assistant", "content": "Hi", "id": "m1"}]}, ())
+
+    short_circuit = StaticRunShortCircuit(MessageCoercingGraph(DictMessageGraph()), StaticReplies(load_forms_manifest()))
+    events = asyncio.run(short_circuit.resolve(RunAgentInput.model_validate(body())))
+    snapshot = next(e for e in events if e.type == EventType.MESSAGES_SNAPSHOT)
+    assert [m.content for m in snapshot.messages][0] == "Hi"
@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+from app.batch import runner
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def crash_on_bad_id(conv_id, turns):
+    if conv_id == "bad":
+        os._exit(1)
+    return {"id": conv_id, "turns": turns}
+
+
+def test_resume_drops_a_partial_trailing_line(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text('{"id": "a"}\n{"id": "b", "tur', encoding="utf-8")
+    runner._truncate_partial_line(out)
+    assert out.read_text(encoding="utf-8") == '{"id": "a"}\n'
+
+
+def test_malformed_input_line_is_reported_with_its_number(tmp_path):
+    src = tmp_path / "in.jsonl"
+    write_lines(src, ['{"id": "a", "turns": []}', "", '{"id": "b", '])
+    with pytest.raises(ValueError, match=r"in\.jsonl:3: invalid JSON"):
+        list(runner.load_conversations(src))
+    assert runner.main([str(src), "--out", str(tmp_path / "out.jsonl")]) == 2
+
+
+def test_a_dead_worker_fails_its_conversations_instead_of_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "_worker_run", crash_on_bad_id)
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(src, [json.dumps({"id": i, "turns": ["reimbursement"]}) for i in ("bad", "x", "y")])
+    stats = runner.run_batch(src, out, workers=1)
+    results = {r["id"]: r for r in read_results(out)}
+    assert set(results) == {"bad", "x", "y"}
+    assert "BrokenProcessPool" in results["bad"]["error"]
+    assert stats["failed"] + stats["completed"] == 3 and stats["failed"] >= 1
+    # Failed records are redone on resume
+    assert runner.load_completed_ids(out) == {i for i, r in results.items() if "error" not in r}
@@ -0,0 +1,139 @@
+import json
+import uuid
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from app.cluster.hashring import ConsistentHashRing
+from app.cluster.proxy import PROXY_SECRET_HEADER, THREAD_ID_HEADER, AffinityProxy
+from app.config.settings import settings
+
+NODES = ["worker-0", "worker-1", "worker-2"]
+KEYS = [f"thread-{i}" for i in range(2000)]
+
+
+def owners(ring):
+    return {key: ring.preference(key)[0] for key in KEYS}
+
+
+def test_ring_spreads_keys_over_every_node():
+    counts = ConsistentHashRing(NODES).distribution(KEYS)
+    assert all(count > len(KEYS) / len(NODES) / 2 for count in counts.values())
+
+
+def test_ring_only_remaps_keys_of_a_down_node_and_restores_them():
+    ring = ConsistentHashRing(NODES)
+    before = owners(ring)
+    ring.mark_down("worker-1")
+    during = owners(ring)
+    for key in KEYS:
+        if before[key] == "worker-1":
+            assert during[key] != "worker-1"
+        else:
+            assert during[key] == before[key]
+    ring.mark_up("worker-1")
+    assert owners(ring) == before
+
+
+def test_ring_with_every_node_down_has_no_preference():
+    ring = ConsistentHashRing(NODES)
+    for node in NODES:
+        ring.mark_down(node)
+    assert ring.preference("thread-1") == []
+
+
+class Body(httpx.AsyncByteStream):
+    # Unread, like a real upstream body, so the proxy can stream it with aiter_raw()
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+
+
+class FakeWorkers:
+    """httpx transport standing in for the worker processes; ``dead`` ones refuse connections."""
+
+    def __init__(self, urls):
+        self.by_port = {httpx.URL(url).port: name for name, url in urls.items()}
+        self.dead = set()
+        self.seen = []
+
+    def __call__(self, request):
+        name = self.by_port[request.url.port]
+        if name in self.dead:
+            raise httpx.ConnectError("connection refused", request=request)
+        self.seen.append((name, request))
+        return httpx.Response(200, headers={"content-type": "application/json"}, stream=Body(json.dumps({"worker": name}).encode()))
+
+
+def make_proxy():
+    urls = {name: f"http://127.0.0.1:{9000 + i}" for i, name in enumerate(NODES)}
+    ring = ConsistentHashRing(NODES)
+    proxy = AffinityProxy(ring, urls, "s3cret")
+    workers = FakeWorkers(urls)
+    proxy.client = httpx.AsyncClient(transport=httpx.MockTransport(workers))
+    return proxy, workers
+
+
+def test_proxy_mints_start_thread_id_and_ignores_the_client_one():
+    proxy, workers = make_proxy()
+    with TestClient(proxy.app) as client:
+        resp = client.post("/api/chat/start", json={"thread_id": "chosen"}, headers={THREAD_ID_HEADER: "chosen", PROXY_SECRET_HEADER: "guess"})
+    assert resp.status_code == 200
+    (name, request), = workers.seen
+    minted = request.headers[THREAD_ID_HEADER]
+    assert minted != "chosen" and uuid.UUID(minted)
+    assert request.headers[PROXY_SECRET_HEADER] == "s3cret"
+    assert name == proxy.ring.owner(minted)
+
+
+def test_proxy_strips_thread_headers_from_other_requests():
+    proxy, workers = make_proxy()
+    with TestClient(proxy.app) as client:
+        client.post("/api/chat/respond", json={"thread_id": "t1", "message": "hi"}, headers={THREAD_ID_HEADER: "x", PROXY_SECRET_HEADER: "y"})
+    (name, request), = workers.seen
+    assert name == proxy.ring.owner("t1")
+    assert THREAD_ID_HEADER not in request.headers and PROXY_SECRET_HEADER not in request.headers
+
+
+def test_proxy_fails_over_and_keeps_displaced_threads_pinned():
+    proxy, workers = make_proxy()
+    key = "t-failover"
+    owner = proxy.ring.owner(key)
+    workers.dead.add(owner)
+    with TestClient(proxy.app) as client:
+        first = client.post("/agent", json={"threadId": key}).json()["worker"]
+        assert first != owner
+        assert owner in proxy.ring.down
+        # The owner comes back; the thread stays where its state now lives
+        workers.dead.clear()
+        proxy.ring.mark_up(owner)
+        assert client.post("/agent", json={"threadId": key}).json()["worker"] == first
+
+
+def test_proxy_answers_503_with_no_live_worker():
+    proxy, workers = make_proxy()
+    workers.dead.update(NODES)
+    with TestClient(proxy.app) as client:
+        resp = client.post("/agent", json={"threadId": "t1"})
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+
+
+def test_worker_only_adopts_thread_id_with_the_proxy_secret(monkeypatch):
+    client = TestClient(main.app)
+    chosen = str(uuid.uuid4())
+    monkeypatch.setattr(settings, "cluster_proxy_secret", None)
+    resp = client.post("/api/chat/start", headers={THREAD_ID_HEADER: chosen, PROXY_SECRET_HEADER: "anything"})
+    assert resp.json()["thread_id"] != chosen
+
+    monkeypatch.setattr(settings, "cluster_proxy_secret", "s3cret")
+    resp = client.post("/api/chat/start", headers={THREAD_ID_HEADER: chosen, PROXY_SECRET_HEADER: "wrong"})
+    assert resp.json()["thread_id"] != chosen
+    resp = client.post("/api/chat/start", headers={THREAD_ID_HEADER: chosen, PROXY_SECRET_HEADER: "s3cret"})
+    assert resp.json()["thread_id"] == chosen
+    # A start never replaces an existing session
+    resp = client.post("/api/chat/start", headers={THREAD_ID_HEADER: chosen, PROXY_SECRET_HEADER: "s3cret"})
+    assert resp.status_code == 409
@@ -0,0 +1,112 @@
+import asyncio
+
+import openai
+import pytest
+
+from app.agents.llm_router import (
+    OUTCOME_DEADLINE,
+    OUTCOME_FALLBACK,
+    OUTCOME_HEDGE,
+    OUTCOME_PRIMARY,
+    TASK_EXTRACT,
+    LLMRouter,
+    LLMStats,
+    TaskRoute,
+)
+from app.agents.llm_usage import UsageAggregator
+from app.config.settings import settings
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.usage_metadata = {"input_tokens": 10, "output_tokens": 2}
+
+
+class FakeClient:
+    """Answers after ``delay_s``, or raises ``error`` after it."""
+
+    def __init__(self, delay_s, content="answer", error=None):
+        self.delay_s = delay_s
+        self.content = content
+        self.error = error
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(self.content)
+
+
+class FakeRouter(LLMRouter):
+    def __init__(self, clients, timeout_s=5.0):
+        route = TaskRoute(TASK_EXTRACT, list(clients), max_tokens=16, timeout_s=timeout_s)
+        super().__init__({TASK_EXTRACT: route}, LLMStats(), UsageAggregator())
+        self.fakes = clients
+
+    def _client(self, model, route):
+        return self.fakes[model]
+
+
+@pytest.fixture(autouse=True)
+def hedge_settings(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_min_samples", 1000)
+    monkeypatch.setattr(settings, "llm_hedge_min_delay_s", 0.0)
+    monkeypatch.setattr(settings, "llm_failure_threshold", 3)
+
+
+def outcomes(router):
+    return router.stats.snapshot()[TASK_EXTRACT]["outcomes"]
+
+
+def test_primary_answers_within_budget():
+    router = FakeRouter({"a": FakeClient(0.01, "primary"), "b": FakeClient(0.01, "fallback")})
+    assert asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=1.0, hedge=True)) == "primary"
+    assert outcomes(router) == {OUTCOME_PRIMARY: 1}
+    assert router.fakes["b"].calls == 0
+
+
+def test_hedge_wins_over_slow_primary():
+    # No samples yet: the hedge starts at half the budget
+    router = FakeRouter({"a": FakeClient(2.0, "slow"), "b": FakeClient(0.01, "hedged")})
+    assert asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=0.4, hedge=True)) == "hedged"
+    assert outcomes(router) == {OUTCOME_HEDGE: 1}
+    models = router.stats.snapshot()[TASK_EXTRACT]["models"]
+    assert models["a"]["cancelled"] == 1
+    assert models["b"]["successes"] == 1
+
+
+def test_error_falls_back_to_next_model():
+    router = FakeRouter({"a": FakeClient(0.0, error=RuntimeError("boom")), "b": FakeClient(0.01, "fallback")})
+    assert asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=1.0)) == "fallback"
+    assert outcomes(router) == {OUTCOME_FALLBACK: 1}
+
+
+def test_deadline_returns_none_for_the_heuristic():
+    router = FakeRouter({"a": FakeClient(2.0), "b": FakeClient(2.0)})
+    assert asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=0.1)) is None
+    assert outcomes(router) == {OUTCOME_DEADLINE: 1}
+
+
+def test_breaker_skips_a_failing_model():
+    router = FakeRouter({"a": FakeClient(0.0, error=RuntimeError("boom")), "b": FakeClient(0.0, "fallback")})
+    for _ in range(3):
+        asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=1.0))
+    assert asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=1.0)) == "fallback"
+    assert router.fakes["a"].calls == 3
+    assert router.stats.snapshot()[TASK_EXTRACT]["models"]["a"]["skipped"] == 1
+
+
+def test_cancelled_and_timed_out_calls_feed_the_hedge_percentile():
+    timeout = openai.APITimeoutError(request=None)
+    router = FakeRouter({"a": FakeClient(2.0), "b": FakeClient(0.05, error=timeout)})
+    asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=0.1))
+    samples = list(router.stats.latencies[TASK_EXTRACT])
+    # The primary was abandoned at the deadline; its elapsed time is capped at the budget
+    assert len(samples) == 1 and 0.09 <= samples[0] <= 0.1
+
+    router = FakeRouter({"a": FakeClient(0.05, error=timeout)})
+    asyncio.run(router.ainvoke(TASK_EXTRACT, "p", budget_s=1.0))
+    assert len(router.stats.latencies[TASK_EXTRACT]) == 1
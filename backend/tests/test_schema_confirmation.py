@@ -0,0 +1,54 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.agents import form_agent
+
+
+class FakeRouter:
+    """Stands in for LLMRouter; every intent classification answers ``reply``."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    async def ainvoke(self, task, prompt, **kwargs):
+        self.calls.append(task)
+        return self.reply
+
+
+def run_turns(router, monkeypatch, *turns):
+    monkeypatch.setattr(form_agent, "build_llm_router", lambda: router)
+    graph = form_agent.build_form_agent_graph()
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+
+    async def drive():
+        await graph.ainvoke({"messages": []}, config)
+        for text in turns:
+            await graph.ainvoke({"pending_user_text": text}, config)
+        return (await graph.aget_state(config)).values
+
+    return asyncio.run(drive())
+
+
+def test_intent_model_confirms_short_plain_reply(monkeypatch):
+    router = FakeRouter("yes")
+    values = run_turns(router, monkeypatch, "reimbursement", "sure thing")
+    assert values["schema_confirmed"] is True
+    assert router.calls == [form_agent.TASK_CONFIRM_INTENT]
+
+
+@pytest.mark.parametrize(
+    "reply",
+    [
+        "looks fine but drop the email field",
+        "fine, without the urgency please",
+        "great, this all seems good to me and I want to continue now",
+    ],
+)
+def test_intent_model_never_confirms_a_change_request(monkeypatch, reply):
+    router = FakeRouter("yes")
+    values = run_turns(router, monkeypatch, "reimbursement", reply)
+    assert values["schema_confirmed"] is False
+    assert router.calls == []
@@ -0,0 +1,80 @@
+import asyncio
+import uuid
+
+import pytest
+from ag_ui.core import EventType, RunAgentInput
+
+from app.agents.form_agent import build_form_agent_graph
+from app.agents.static_replies import StaticReplies, load_forms_manifest
+from app.routes.static_runs import StaticRunShortCircuit
+
+
+@pytest.fixture(scope="module")
+def replies():
+    return StaticReplies(load_forms_manifest())
+
+
+def run_input(thread_id, text=None):
+    state = {"pending_user_text": text} if text else {}
+    return RunAgentInput(thread_id=thread_id, run_id=str(uuid.uuid4()), state=state, messages=[], tools=[], context=[], forwarded_props={})
+
+
+def served_message(events):
+    snapshot = next(e for e in events if e.type == EventType.MESSAGES_SNAPSHOT)
+    return snapshot.messages[-1]
+
+
+def checkpoint(graph, thread_id):
+    return asyncio.run(graph.aget_state({"configurable": {"thread_id": thread_id}})).values
+
+
+def test_greeting_is_served_without_a_checkpoint(replies):
+    graph = build_form_agent_graph()
+    short_circuit = StaticRunShortCircuit(graph, replies)
+    events = asyncio.run(short_circuit.resolve(run_input("t1")))
+    assert [e.type for e in events] == [
+        EventType.RUN_STARTED, EventType.STATE_SNAPSHOT, EventType.MESSAGES_SNAPSHOT, EventType.RUN_FINISHED,
+    ]
+    assert served_message(events).content == replies.greeting
+    assert checkpoint(graph, "t1") == {}
+
+
+def test_first_input_materializes_the_served_greeting(replies):
+    graph = build_form_agent_graph()
+    short_circuit = StaticRunShortCircuit(graph, replies)
+    greeting = served_message(asyncio.run(short_circuit.resolve(run_input("t1"))))
+    # A reload before the first turn keeps the same greeting and asks for the form
+    reload = next(e for e in asyncio.run(short_circuit.resolve(run_input("t1"))) if e.type == EventType.MESSAGES_SNAPSHOT)
+    assert [m.id for m in reload.messages][0] == greeting.id
+    assert reload.messages[-1].content == replies.choose_form
+
+    assert asyncio.run(short_circuit.resolve(run_input("t1", "reimbursement"))) is None
+    values = checkpoint(graph, "t1")
+    assert values["greeted"] is True
+    assert [(m.id, m.content) for m in values["messages"]] == [(greeting.id, replies.greeting)]
+    assert short_circuit.materialized == 1
+
+    # The graph takes the turn from the materialized state
+    config = {"configurable": {"thread_id": "t1"}}
+    asyncio.run(graph.ainvoke({"pending_user_text": "reimbursement"}, config))
+    assert checkpoint(graph, "t1")["form_type"] == "reimbursement"
+
+
+def test_evicted_greeting_is_resent_not_persisted(replies):
+    graph = build_form_agent_graph()
+    short_circuit = StaticRunShortCircuit(graph, replies, max_pending=2)
+    first = {t: served_message(asyncio.run(short_circuit.resolve(run_input(t)))) for t in ("a", "b", "c")}
+    assert list(short_circuit._lazy_greeted) == ["b", "c"]
+    assert short_circuit.evicted == 1
+
+    again = served_message(asyncio.run(short_circuit.resolve(run_input("a"))))
+    assert again.content == replies.greeting and again.id != first["a"].id
+    assert checkpoint(graph, "a") == {}
+
+
+def test_greeted_thread_without_a_form_gets_the_form_prompt(replies):
+    graph = build_form_agent_graph()
+    short_circuit = StaticRunShortCircuit(graph, replies)
+    asyncio.run(graph.ainvoke({"messages": []}, {"configurable": {"thread_id": "t1"}}))
+    events = asyncio.run(short_circuit.resolve(run_input("t1")))
+    assert served_message(events).content == replies.choose_form